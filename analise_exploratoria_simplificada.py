@@ -1,125 +1,640 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Configurações para visualização
-plt.style.use('seaborn-v0_8-whitegrid')
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.rcParams['font.size'] = 12
-sns.set_palette('viridis')
-
-# Carregando o dataset
-df = pd.read_csv('framingham.csv')
-
-# Exibindo informações básicas
-print("Informações do Dataset:")
-print(f"Dimensões: {df.shape}")
-print("\nPrimeiras linhas:")
-print(df.head())
-print("\nInformações sobre as colunas:")
-print(df.info())
-print("\nEstatísticas descritivas:")
-print(df.describe())
-
-# Verificando valores nulos
-print("\nValores nulos por coluna:")
-print(df.isnull().sum())
-
-# Limpeza dos dados - preenchendo valores nulos com a mediana
-df_clean = df.copy()
-for col in df.columns:
-    if df[col].isnull().sum() > 0:
-        if df[col].dtype != 'object':  # Se for numérica
-            median_val = df[col].median()
-            df_clean[col] = df[col].fillna(median_val)
-            print(f"Preenchidos {df[col].isnull().sum()} valores em '{col}' com a mediana: {median_val}")
-
-# Análise de distribuição das variáveis principais
-plt.figure(figsize=(14, 10))
-
-# Variáveis numéricas para analisar
-numeric_vars = ['age', 'cigsPerDay', 'totChol', 'sysBP', 'diaBP', 'BMI', 'heartRate', 'glucose']
-
-for i, var in enumerate(numeric_vars):
-    plt.subplot(3, 3, i+1)
-    sns.histplot(df_clean[var], kde=True)
-    plt.title(f'Distribuição de {var}')
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cache, cached_property
+from populacao import (ARQUIVO_POPULACAO, ARQUIVO_ESTATISTICAS, ARQUIVO_DISTRIBUICOES, ARQUIVO_BINARIO,
+                       ARQUIVO_ESTRATOS, COLUNAS_DISTRIBUICAO, calcular_impressao_digital, calcular_distribuicoes,
+                       salvar_distribuicoes, salvar_populacao_binaria, calcular_estratos, salvar_estratos,
+                       ContextoPopulacao)
+
+# pandas, matplotlib e seaborn são importados apenas pelas etapas que precisam
+# ser executadas, para que uma execução sem alterações termine rapidamente
+
+# Dataset original e registro das etapas já executadas
+ARQUIVO_ORIGINAL = 'framingham.csv'
+ARQUIVO_MANIFESTO = '.analise_exploratoria.json'
+
+# Formatos aceitos para as figuras (o padrão é png na resolução padrão do matplotlib)
+FORMATOS_GRAFICOS = ['png', 'svg', 'pdf', 'jpg']
+
+# Variáveis numéricas do gráfico de distribuições
+VARIAVEIS_DISTRIBUICAO = ['age', 'cigsPerDay', 'totChol', 'sysBP', 'diaBP', 'BMI', 'heartRate', 'glucose']
+
+class DadosAnalise:
+    """
+    Datasets usados pelas etapas, lidos sob demanda e compartilhados entre elas.
+    Com tamanho_bloco os arquivos são lidos em blocos e as etapas usam apenas
+    estatísticas acumuladas, com memória limitada independentemente do tamanho do dataset.
+    formato e dpi definem como as figuras são salvas (dpi None: resolução da figura).
+    """
+    def __init__(self, tamanho_bloco=None, formato='png', dpi=None):
+        self.tamanho_bloco = tamanho_bloco
+        self.formato = formato
+        self.dpi = dpi
+
+    def preparar(self, atributos_blocos):
+        """
+        Carrega os dados usados pelos gráficos antes de distribuí-los entre processos,
+        para que cada processo receba os dados prontos em vez de relê-los
+        """
+        for atributo in (atributos_blocos if self.tamanho_bloco else ['df_clean']):
+            getattr(self, atributo)
+
+    def blocos(self, caminho):
+        import pandas as pd
+        return pd.read_csv(caminho, chunksize=self.tamanho_bloco)
+
+    @cached_property
+    def df(self):
+        import pandas as pd
+        return pd.read_csv(ARQUIVO_ORIGINAL)
+
+    @cached_property
+    def df_clean(self):
+        import pandas as pd
+        return pd.read_csv(ARQUIVO_POPULACAO)
+
+    @cached_property
+    def resumo_blocos(self):
+        """
+        Uma passagem pelo dataset limpo acumulando momentos, correlações, quantis e contagens por grupo
+        """
+        from estatisticas_blocos import AcumuladorMomentos, AcumuladorCorrelacao, EsbocoQuantis
+        momentos = correlacao = None
+        esbocos = {}
+        esbocos_risco = {}
+        contagens_genero = {}
+        for bloco in self.blocos(ARQUIVO_POPULACAO):
+            if momentos is None:
+                colunas = bloco.select_dtypes('number').columns
+                momentos = AcumuladorMomentos(colunas)
+                correlacao = AcumuladorCorrelacao(colunas)
+                esbocos = {coluna: EsbocoQuantis() for coluna in colunas}
+            valores = bloco[momentos.colunas].to_numpy(dtype=float)
+            momentos.atualizar(valores)
+            correlacao.atualizar(valores)
+            for i, coluna in enumerate(momentos.colunas):
+                esbocos[coluna].atualizar(valores[:, i])
+
+            # Contagens e quantis por grupo usados nos gráficos de risco
+            for (risco, masculino), n in bloco.groupby(['TenYearCHD', 'male']).size().items():
+                chave = (int(risco), int(masculino))
+                contagens_genero[chave] = contagens_genero.get(chave, 0) + int(n)
+            for coluna in ('age', 'sysBP'):
+                for risco, grupo in bloco.groupby('TenYearCHD')[coluna]:
+                    esbocos_risco.setdefault((coluna, int(risco)), EsbocoQuantis()).atualizar(grupo.to_numpy())
+
+        return {'momentos': momentos, 'correlacao': correlacao, 'esbocos': esbocos,
+                'esbocos_risco': esbocos_risco, 'contagens_genero': contagens_genero}
+
+    @cached_property
+    def distribuicoes_blocos(self):
+        """
+        Segunda passagem pelo dataset limpo acumulando histogramas e curvas KDE,
+        com bins e largura de banda definidos pelas estatísticas da primeira
+        """
+        from estatisticas_blocos import AcumuladorHistograma
+        resumo = self.resumo_blocos
+        momentos = resumo['momentos']
+        colunas = list(dict.fromkeys(VARIAVEIS_DISTRIBUICAO + COLUNAS_DISTRIBUICAO))
+        desvios = dict(zip(momentos.colunas, momentos.desvios()))
+        acumuladores = {}
+        for coluna in colunas:
+            i = momentos.colunas.index(coluna)
+            esboco = resumo['esbocos'][coluna]
+            acumuladores[coluna] = AcumuladorHistograma.a_partir_de(
+                momentos.n[i], momentos.minimo[i], momentos.maximo[i], desvios[coluna],
+                esboco.quantil(0.25), esboco.quantil(0.75))
+        for bloco in self.blocos(ARQUIVO_POPULACAO):
+            for coluna, acumulador in acumuladores.items():
+                acumulador.atualizar(bloco[coluna].to_numpy())
+        return {coluna: acumulador.distribuicao() for coluna, acumulador in acumuladores.items()}
+
+_graficos = None
+
+def obter_graficos():
+    """
+    Importa matplotlib e seaborn sob demanda e aplica as configurações de visualização uma única vez
+    """
+    global _graficos
+    if _graficos is None:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Configurações para visualização
+        plt.style.use('seaborn-v0_8-whitegrid')
+        plt.rcParams['figure.figsize'] = (12, 8)
+        plt.rcParams['font.size'] = 12
+        sns.set_palette('viridis')
+        _graficos = (plt, sns)
+    return _graficos
+
+def salvar_grafico(dados, fig, nome):
+    """
+    Salva a figura no formato e na resolução escolhidos e a fecha
+    """
+    plt, _ = obter_graficos()
+    fig.savefig(f'{nome}.{dados.formato}', dpi=dados.dpi or 'figure')
+    plt.close(fig)
+
+# Etapas da análise
+
+def limpar_dados(dados):
+    """
+    Exibe informações do dataset original e preenche os valores nulos com a mediana
+    """
+    if dados.tamanho_bloco:
+        limpar_dados_em_blocos(dados)
+        return
+    df = dados.df
+
+    # Exibindo informações básicas
+    print("Informações do Dataset:")
+    print(f"Dimensões: {df.shape}")
+    print("\nPrimeiras linhas:")
+    print(df.head())
+    print("\nInformações sobre as colunas:")
+    print(df.info())
+    print("\nEstatísticas descritivas:")
+    print(df.describe())
+
+    # Verificando valores nulos
+    print("\nValores nulos por coluna:")
+    print(df.isnull().sum())
+
+    # Limpeza dos dados - preenchendo valores nulos com a mediana
+    df_clean = df.copy()
+    for col in df.columns:
+        if df[col].isnull().sum() > 0:
+            if df[col].dtype != 'object':  # Se for numérica
+                median_val = df[col].median()
+                df_clean[col] = df[col].fillna(median_val)
+                print(f"Preenchidos {df[col].isnull().sum()} valores em '{col}' com a mediana: {median_val}")
+
+    # Salvando o dataset limpo
+    df_clean.to_csv(ARQUIVO_POPULACAO, index=False)
+    dados.df_clean = df_clean
+    print(f"Dataset limpo salvo como '{ARQUIVO_POPULACAO}'")
+
+def limpar_dados_em_blocos(dados):
+    """
+    Limpeza em duas passagens: a primeira conta os nulos e estima as medianas
+    com esboços de quantis; a segunda preenche os nulos e grava o dataset limpo bloco a bloco
+    """
+    from estatisticas_blocos import EsbocoQuantis
+    linhas = 0
+    nulos = None
+    flutuantes = set()
+    esbocos = {}
+    for bloco in dados.blocos(ARQUIVO_ORIGINAL):
+        linhas += len(bloco)
+        nulos = bloco.isnull().sum() if nulos is None else nulos + bloco.isnull().sum()
+        for col in bloco.columns:
+            if bloco[col].dtype != 'object':  # Se for numérica
+                if bloco[col].dtype.kind == 'f':
+                    flutuantes.add(col)
+                esbocos.setdefault(col, EsbocoQuantis()).atualizar(bloco[col].to_numpy())
+
+    print("Informações do Dataset:")
+    print(f"Dimensões: ({linhas}, {len(nulos)})")
+    print("\nValores nulos por coluna:")
+    print(nulos)
+
+    medianas = {}
+    for col in nulos.index:
+        if nulos[col] > 0 and col in esbocos:
+            medianas[col] = esbocos[col].quantil(0.5)
+            print(f"Preenchidos {nulos[col]} valores em '{col}' com a mediana: {medianas[col]}")
+
+    # Colunas com nulos ou decimais em algum bloco são gravadas como float em todos
+    with open(ARQUIVO_POPULACAO, 'w', newline='') as saida:
+        for i, bloco in enumerate(dados.blocos(ARQUIVO_ORIGINAL)):
+            bloco = bloco.astype({col: float for col in flutuantes}).fillna(medianas)
+            bloco.to_csv(saida, index=False, header=i == 0)
+    print(f"Dataset limpo salvo como '{ARQUIVO_POPULACAO}'")
+
+def calcular_estatisticas(dados):
+    """
+    Salva estatísticas importantes e valores de referência para categorização de risco
+    """
+    if dados.tamanho_bloco:
+        resumo = dados.resumo_blocos
+        momentos = resumo['momentos']
+        medias, minimos, maximos = momentos.medias(), momentos.minimos(), momentos.maximos()
+        quantis = {q: {coluna: esboco.quantil(q) for coluna, esboco in resumo['esbocos'].items()}
+                   for q in (0.25, 0.5, 0.75)}
+    else:
+        df_clean = dados.df_clean
+        medias, minimos, maximos = df_clean.mean().to_dict(), df_clean.min().to_dict(), df_clean.max().to_dict()
+        quantis = {0.25: df_clean.quantile(0.25).to_dict(),
+                   0.5: df_clean.median().to_dict(),
+                   0.75: df_clean.quantile(0.75).to_dict()}
+
+    referencias = {
+        'age': {'baixo': quantis[0.25]['age'],
+                'moderado': quantis[0.5]['age'],
+                'alto': quantis[0.75]['age']},
+
+        'sysBP': {'baixo': 120, 'moderado': 130, 'alto': 140},
+        'diaBP': {'baixo': 80, 'moderado': 85, 'alto': 90},
+        'BMI': {'baixo': 18.5, 'moderado': 25, 'alto': 30},
+        'glucose': {'baixo': 100, 'moderado': 125, 'alto': 140},
+        'totChol': {'baixo': 200, 'moderado': 240, 'alto': 280},
+        'cigsPerDay': {'baixo': 0, 'moderado': 5, 'alto': 10},
+        'heartRate': {'baixo': 60, 'moderado': 80, 'alto': 100}
+    }
+
+    # Mínimos, máximos e a impressão digital do dataset limpo permitem que os
+    # relatórios usem o resumo da população sem recalculá-lo
+    estatisticas = {
+        'medias': medias,
+        'medianas': quantis[0.5],
+        'minimos': minimos,
+        'maximos': maximos,
+        'percentil_25': quantis[0.25],
+        'percentil_75': quantis[0.75],
+        'referencias': referencias,
+        'populacao_sha256': calcular_impressao_digital(ARQUIVO_POPULACAO)
+    }
+
+    with open(ARQUIVO_ESTATISTICAS, 'w') as f:
+        json.dump(estatisticas, f, indent=4)
+
+def pre_calcular_distribuicoes(dados):
+    """
+    Pré-calcula histogramas e curvas KDE usados nos gráficos comparativos dos relatórios
+    """
+    if dados.tamanho_bloco:
+        distribuicoes = {coluna: dados.distribuicoes_blocos[coluna] for coluna in COLUNAS_DISTRIBUICAO}
+    else:
+        distribuicoes = calcular_distribuicoes(dados.df_clean)
+    salvar_distribuicoes(distribuicoes, calcular_impressao_digital(ARQUIVO_POPULACAO))
+
+def gravar_populacao_binaria(dados):
+    """
+    Grava a população em formato binário compacto, mapeado em memória pelos relatórios
+    """
+    if dados.tamanho_bloco:
+        obter_blocos = lambda: dados.blocos(ARQUIVO_POPULACAO)
+    else:
+        obter_blocos = lambda: [dados.df_clean]
+    salvar_populacao_binaria(obter_blocos, calcular_impressao_digital(ARQUIVO_POPULACAO))
+
+def calcular_indice_estratos(dados):
+    """
+    Pré-calcula resumo e distribuições de cada estrato (sexo x década de idade)
+    a partir dos valores ordenados por estrato da população binária. Se ela estiver
+    ausente ou desatualizada, os valores são calculados a partir do dataset limpo.
+    """
+    contexto = ContextoPopulacao()
+    salvar_estratos(calcular_estratos(contexto.valores_por_estrato), contexto.impressao_digital)
+
+def grafico_distribuicoes(dados):
+    """
+    Análise de distribuição das variáveis principais
+    """
+    import numpy as np
+    plt, sns = obter_graficos()
+    fig = plt.figure(figsize=(14, 10))
+
+    for i, var in enumerate(VARIAVEIS_DISTRIBUICAO):
+        plt.subplot(3, 3, i+1)
+        if dados.tamanho_bloco:
+            # Histograma e KDE acumulados, desenhados como o sns.histplot
+            distribuicao = dados.distribuicoes_blocos[var]
+            bordas = np.asarray(distribuicao['bordas'])
+            cor = sns.color_palette()[0]
+            plt.bar(bordas[:-1], distribuicao['contagens'], width=np.diff(bordas), align='edge',
+                    color=cor, alpha=0.75, edgecolor='white', linewidth=0.5)
+            plt.plot(distribuicao['kde_x'], distribuicao['kde_y'], color=cor)
+            plt.xlabel(var)
+            plt.ylabel('Count')
+        else:
+            sns.histplot(dados.df_clean[var], kde=True)
+        plt.title(f'Distribuição de {var}')
+
+    # Um único ajuste do layout depois de todos os subplots
     plt.tight_layout()
+    salvar_grafico(dados, fig, 'distribuicoes')
 
-plt.savefig('distribuicoes.png')
-
-# Análise da correlação entre as variáveis
-plt.figure(figsize=(14, 12))
-corr_matrix = df_clean.corr()
-mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
-sns.heatmap(corr_matrix, mask=mask, annot=True, fmt=".2f", 
-            cmap='coolwarm', linewidths=0.5, vmin=-1, vmax=1)
-plt.title('Matriz de Correlação', fontsize=16)
-plt.tight_layout()
-plt.savefig('correlacao.png')
-
-# Análise por gênero
-plt.figure(figsize=(12, 8))
-sns.countplot(x='TenYearCHD', hue='male', data=df_clean)
-plt.title('Risco de Doença Cardíaca por Gênero')
-plt.xlabel('Risco de Doença Cardíaca')
-plt.ylabel('Quantidade')
-plt.xticks([0, 1], ['Não', 'Sim'])
-plt.legend(['Feminino', 'Masculino'])
-plt.tight_layout()
-plt.savefig('risco_por_genero.png')
-
-# Relação entre idade e risco
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='TenYearCHD', y='age', data=df_clean)
-plt.title('Relação entre Idade e Risco de Doença Cardíaca')
-plt.xlabel('Risco de Doença Cardíaca')
-plt.ylabel('Idade')
-plt.xticks([0, 1], ['Não', 'Sim'])
-plt.tight_layout()
-plt.savefig('risco_por_idade.png')
-
-# Relação entre pressão sistólica e risco
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='TenYearCHD', y='sysBP', data=df_clean)
-plt.title('Relação entre Pressão Sistólica e Risco de Doença Cardíaca')
-plt.xlabel('Risco de Doença Cardíaca')
-plt.ylabel('Pressão Sistólica')
-plt.xticks([0, 1], ['Não', 'Sim'])
-plt.tight_layout()
-plt.savefig('risco_por_pressao.png')
-
-# Cálculo de valores de referência para categorização de risco
-referencias = {
-    'age': {'baixo': df_clean['age'].quantile(0.25), 
-            'moderado': df_clean['age'].quantile(0.5),
-            'alto': df_clean['age'].quantile(0.75)},
-    
-    'sysBP': {'baixo': 120, 'moderado': 130, 'alto': 140},
-    'diaBP': {'baixo': 80, 'moderado': 85, 'alto': 90},
-    'BMI': {'baixo': 18.5, 'moderado': 25, 'alto': 30},
-    'glucose': {'baixo': 100, 'moderado': 125, 'alto': 140},
-    'totChol': {'baixo': 200, 'moderado': 240, 'alto': 280},
-    'cigsPerDay': {'baixo': 0, 'moderado': 5, 'alto': 10},
-    'heartRate': {'baixo': 60, 'moderado': 80, 'alto': 100}
-}
-
-# Salvando estatísticas importantes e valores de referência
-estatisticas = {
-    'medias': df_clean.mean().to_dict(),
-    'medianas': df_clean.median().to_dict(),
-    'percentil_25': df_clean.quantile(0.25).to_dict(),
-    'percentil_75': df_clean.quantile(0.75).to_dict(),
-    'referencias': referencias
-}
+def grafico_correlacao(dados):
+    """
+    Análise da correlação entre as variáveis
+    """
+    import numpy as np
+    plt, sns = obter_graficos()
+    fig = plt.figure(figsize=(14, 12))
+    if dados.tamanho_bloco:
+        import pandas as pd
+        correlacao = dados.resumo_blocos['correlacao']
+        corr_matrix = pd.DataFrame(correlacao.correlacao(), index=correlacao.colunas, columns=correlacao.colunas)
+    else:
+        corr_matrix = dados.df_clean.corr()
+    mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
+    sns.heatmap(corr_matrix, mask=mask, annot=True, fmt=".2f",
+                cmap='coolwarm', linewidths=0.5, vmin=-1, vmax=1)
+    plt.title('Matriz de Correlação', fontsize=16)
+    plt.tight_layout()
+    salvar_grafico(dados, fig, 'correlacao')
 
-import json
-with open('estatisticas.json', 'w') as f:
-    json.dump(estatisticas, f, indent=4)
+def grafico_risco_por_genero(dados):
+    """
+    Análise por gênero
+    """
+    plt, sns = obter_graficos()
+    fig = plt.figure(figsize=(12, 8))
+    if dados.tamanho_bloco:
+        import pandas as pd
+        contagens = pd.DataFrame([{'TenYearCHD': risco, 'male': masculino, 'Quantidade': n}
+                                  for (risco, masculino), n in sorted(dados.resumo_blocos['contagens_genero'].items())])
+        sns.barplot(x='TenYearCHD', y='Quantidade', hue='male', data=contagens)
+    else:
+        sns.countplot(x='TenYearCHD', hue='male', data=dados.df_clean)
+    plt.title('Risco de Doença Cardíaca por Gênero')
+    plt.xlabel('Risco de Doença Cardíaca')
+    plt.ylabel('Quantidade')
+    plt.xticks([0, 1], ['Não', 'Sim'])
+    plt.legend(['Feminino', 'Masculino'])
+    plt.tight_layout()
+    salvar_grafico(dados, fig, 'risco_por_genero')
+
+def desenhar_boxplot_risco(dados, coluna):
+    """
+    Boxplot de uma variável por risco de doença cardíaca (a partir dos quartis acumulados no modo em blocos)
+    """
+    plt, sns = obter_graficos()
+    if dados.tamanho_bloco:
+        esbocos = dados.resumo_blocos['esbocos_risco']
+        estatisticas = [esbocos[(coluna, risco)].estatisticas_boxplot() for risco in (0, 1)]
+        plt.gca().bxp(estatisticas, positions=[0, 1], showfliers=False, patch_artist=True,
+                      boxprops={'facecolor': sns.color_palette()[0]}, medianprops={'color': 'black'})
+    else:
+        sns.boxplot(x='TenYearCHD', y=coluna, data=dados.df_clean)
+
+def grafico_risco_por_idade(dados):
+    """
+    Relação entre idade e risco
+    """
+    plt, sns = obter_graficos()
+    fig = plt.figure(figsize=(10, 6))
+    desenhar_boxplot_risco(dados, 'age')
+    plt.title('Relação entre Idade e Risco de Doença Cardíaca')
+    plt.xlabel('Risco de Doença Cardíaca')
+    plt.ylabel('Idade')
+    plt.xticks([0, 1], ['Não', 'Sim'])
+    plt.tight_layout()
+    salvar_grafico(dados, fig, 'risco_por_idade')
+
+def grafico_risco_por_pressao(dados):
+    """
+    Relação entre pressão sistólica e risco
+    """
+    plt, sns = obter_graficos()
+    fig = plt.figure(figsize=(10, 6))
+    desenhar_boxplot_risco(dados, 'sysBP')
+    plt.title('Relação entre Pressão Sistólica e Risco de Doença Cardíaca')
+    plt.xlabel('Risco de Doença Cardíaca')
+    plt.ylabel('Pressão Sistólica')
+    plt.xticks([0, 1], ['Não', 'Sim'])
+    plt.tight_layout()
+    salvar_grafico(dados, fig, 'risco_por_pressao')
+
+# Etapas em ordem de dependência: cada uma é refeita quando suas entradas,
+# suas saídas ou seu código mudam desde a última execução. As etapas de gráficos
+# não dependem umas das outras e podem ser executadas em paralelo; 'requer' lista
+# os dados de DadosAnalise que usam no modo em blocos e {formato} nas saídas é
+# substituído pelo formato escolhido.
+ETAPAS = [
+    {'nome': 'limpeza', 'funcao': limpar_dados,
+     'entradas': [ARQUIVO_ORIGINAL], 'saidas': [ARQUIVO_POPULACAO]},
+    {'nome': 'estatisticas', 'funcao': calcular_estatisticas,
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': [ARQUIVO_ESTATISTICAS]},
+    {'nome': 'distribuicoes_populacao', 'funcao': pre_calcular_distribuicoes,
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': [ARQUIVO_DISTRIBUICOES]},
+    {'nome': 'populacao_binaria', 'funcao': gravar_populacao_binaria,
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': [ARQUIVO_BINARIO]},
+    {'nome': 'estratos', 'funcao': calcular_indice_estratos,
+     'entradas': [ARQUIVO_POPULACAO, ARQUIVO_BINARIO], 'saidas': [ARQUIVO_ESTRATOS]},
+    {'nome': 'distribuicoes', 'funcao': grafico_distribuicoes, 'grafico': True, 'requer': ['distribuicoes_blocos'],
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': ['distribuicoes.{formato}']},
+    {'nome': 'correlacao', 'funcao': grafico_correlacao, 'grafico': True, 'requer': ['resumo_blocos'],
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': ['correlacao.{formato}']},
+    {'nome': 'risco_por_genero', 'funcao': grafico_risco_por_genero, 'grafico': True, 'requer': ['resumo_blocos'],
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': ['risco_por_genero.{formato}']},
+    {'nome': 'risco_por_idade', 'funcao': grafico_risco_por_idade, 'grafico': True, 'requer': ['resumo_blocos'],
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': ['risco_por_idade.{formato}']},
+    {'nome': 'risco_por_pressao', 'funcao': grafico_risco_por_pressao, 'grafico': True, 'requer': ['resumo_blocos'],
+     'entradas': [ARQUIVO_POPULACAO], 'saidas': ['risco_por_pressao.{formato}']},
+]
+
+# Código usado pelas etapas além das suas funções: alterá-lo refaz todas as etapas
+CODIGO_COMPARTILHADO = [DadosAnalise, obter_graficos, salvar_grafico, limpar_dados_em_blocos, desenhar_boxplot_risco]
+MODULOS_AUXILIARES = ['populacao', 'estatisticas_blocos']
+
+# Controle das etapas já executadas
+
+@cache
+def versao_codigo_compartilhado():
+    """
+    Hash do código compartilhado entre as etapas e dos módulos auxiliares
+    """
+    codigo = hashlib.sha256()
+    for objeto in CODIGO_COMPARTILHADO + [importlib.import_module(modulo) for modulo in MODULOS_AUXILIARES]:
+        codigo.update(inspect.getsource(objeto).encode('utf-8'))
+    return codigo.hexdigest()
+
+def versao_codigo(funcao):
+    """
+    Hash do código-fonte de uma etapa e do código compartilhado que ela usa
+    """
+    codigo = inspect.getsource(funcao) + versao_codigo_compartilhado()
+    return hashlib.sha256(codigo.encode('utf-8')).hexdigest()
+
+def impressao_arquivo(caminho, anterior=None):
+    """
+    Data de modificação, tamanho e hash de um arquivo. O hash só é recalculado
+    se a data de modificação ou o tamanho mudaram desde a impressão anterior.
+    """
+    info = os.stat(caminho)
+    impressao = {'mtime_ns': info.st_mtime_ns, 'tamanho': info.st_size}
+    if anterior and all(anterior.get(chave) == valor for chave, valor in impressao.items()):
+        impressao['sha256'] = anterior['sha256']
+    else:
+        impressao['sha256'] = calcular_impressao_digital(caminho)
+    return impressao
+
+def ler_manifesto(caminho=ARQUIVO_MANIFESTO):
+    """
+    Lê o registro das etapas executadas (vazio se ausente ou inválido)
+    """
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+def salvar_manifesto(manifesto, caminho=ARQUIVO_MANIFESTO):
+    """
+    Grava o registro das etapas executadas sem expor arquivos incompletos
+    """
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w') as f:
+        json.dump(manifesto, f, indent=4)
+    os.replace(temporario, caminho)
+
+def motivo_execucao(etapa, registro, impressoes, modo):
+    """
+    Devolve o motivo para refazer uma etapa, ou None se suas saídas estão atualizadas
+    """
+    if registro is None:
+        return 'sem execução anterior'
+    if registro.get('modo') != modo:
+        return f'modo {modo}'
+    if registro.get('codigo') != versao_codigo(etapa['funcao']):
+        return 'código alterado'
+    for saida in etapa['saidas']:
+        if not os.path.exists(saida):
+            return f'{saida} ausente'
+        info = os.stat(saida)
+        anterior = registro['saidas'].get(saida, {})
+        if (anterior.get('mtime_ns'), anterior.get('tamanho')) != (info.st_mtime_ns, info.st_size):
+            return f'{saida} modificado'
+    for entrada in etapa['entradas']:
+        if registro['entradas'].get(entrada, {}).get('sha256') != impressoes[entrada]['sha256']:
+            return f'{entrada} alterado'
+    return None
+
+# Dados compartilhados pelos processos que geram os gráficos
+_dados_graficos = None
+
+def _inicializar_graficos(dados):
+    """
+    Recebe os dados já carregados no processo principal, uma vez por processo do pool
+    """
+    global _dados_graficos
+    _dados_graficos = dados
+
+def _executar_grafico(funcao):
+    """
+    Gera um gráfico dentro de um processo do pool e devolve o tempo gasto
+    """
+    inicio = time.perf_counter()
+    funcao(_dados_graficos)
+    return time.perf_counter() - inicio
+
+def executar_analise(etapas=ETAPAS, forcar=False, tamanho_bloco=None, caminho_manifesto=ARQUIVO_MANIFESTO,
+                     workers=1, formato='png', dpi=None):
+    """
+    Executa as etapas desatualizadas e devolve os nomes das etapas executadas.
+    Com tamanho_bloco os dados são processados em blocos desse número de linhas.
+    Com workers > 1 os gráficos desatualizados são gerados em paralelo, depois das
+    demais etapas, por processos que recebem os dados já limpos.
+    """
+    manifesto = ler_manifesto(caminho_manifesto)
+    dados = DadosAnalise(tamanho_bloco, formato, dpi)
+    modo = 'blocos' if tamanho_bloco else 'memoria'
+    # Formato e resolução fazem parte do modo dos gráficos: mudá-los refaz apenas as figuras
+    modo_graficos = f"{modo}, {formato}, {dpi or 'padrão'} dpi"
+    impressoes = {}
+    executadas = []
+    graficos_pendentes = []
+
+    def registrar(etapa, modo_etapa):
+        for saida in etapa['saidas']:
+            impressoes[saida] = impressao_arquivo(saida)
+        manifesto[etapa['nome']] = {
+            'codigo': versao_codigo(etapa['funcao']),
+            'modo': modo_etapa,
+            'entradas': {entrada: impressoes[entrada] for entrada in etapa['entradas']},
+            'saidas': {saida: impressoes[saida] for saida in etapa['saidas']}
+        }
+        salvar_manifesto(manifesto, caminho_manifesto)
+        executadas.append(etapa['nome'])
+
+    for etapa in etapas:
+        nome = etapa['nome']
+        registro = manifesto.get(nome)
+        modo_etapa = modo
+        if etapa.get('grafico'):
+            modo_etapa = modo_graficos
+            etapa = dict(etapa, saidas=[saida.format(formato=formato) for saida in etapa['saidas']])
+
+        # Cada entrada tem seu hash calculado no máximo uma vez por execução
+        for entrada in etapa['entradas']:
+            if entrada not in impressoes:
+                anterior = registro['entradas'].get(entrada) if registro else None
+                impressoes[entrada] = impressao_arquivo(entrada, anterior)
+
+        motivo = 'execução forçada' if forcar else motivo_execucao(etapa, registro, impressoes, modo_etapa)
+        if motivo is None:
+            # Atualizar datas de entradas regravadas com o mesmo conteúdo
+            entradas = {entrada: impressoes[entrada] for entrada in etapa['entradas']}
+            if entradas != registro['entradas']:
+                registro['entradas'] = entradas
+                salvar_manifesto(manifesto, caminho_manifesto)
+            continue
+
+        print(f"\nEtapa '{nome}' ({motivo})")
+        if etapa.get('grafico') and workers > 1:
+            graficos_pendentes.append(etapa)
+            continue
+        inicio = time.perf_counter()
+        etapa['funcao'](dados)
+        registrar(etapa, modo_etapa)
+        print(f"Etapa '{nome}' concluída em {time.perf_counter() - inicio:.2f} s")
+
+    if graficos_pendentes:
+        # Os dados são carregados uma única vez aqui e herdados pelos processos
+        dados.preparar(sorted({atributo for etapa in graficos_pendentes for atributo in etapa.get('requer', [])}))
+        processos = min(workers, len(graficos_pendentes))
+        print(f"\nGerando {len(graficos_pendentes)} gráfico(s) em {processos} processo(s)...")
+        with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_graficos,
+                                 initargs=(dados,)) as executor:
+            futuros = {executor.submit(_executar_grafico, etapa['funcao']): etapa for etapa in graficos_pendentes}
+            for futuro in as_completed(futuros):
+                etapa = futuros[futuro]
+                duracao = futuro.result()
+                registrar(etapa, modo_graficos)
+                print(f"Etapa '{etapa['nome']}' concluída em {duracao:.2f} s")
+
+    return executadas
+
+def main():
+    parser = argparse.ArgumentParser(description='Análise exploratória e preparação dos dados de Framingham')
+    parser.add_argument('-f', '--forcar', action='store_true',
+                      help='Refazer todas as etapas, mesmo as que estão atualizadas')
+    parser.add_argument('-b', '--tamanho-bloco', type=int,
+                      help='Processar o dataset em blocos com este número de linhas, com memória limitada '
+                           '(estatísticas por acumuladores e esboços de quantis)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                      help='Número de processos que geram os gráficos em paralelo (padrão: 1)')
+    parser.add_argument('--formato', choices=FORMATOS_GRAFICOS, default='png',
+                      help='Formato das figuras (padrão: png)')
+    parser.add_argument('--dpi', type=int,
+                      help='Resolução das figuras em pontos por polegada (padrão: a da figura, 100)')
+    args = parser.parse_args()
+
+    if args.tamanho_bloco is not None and args.tamanho_bloco < 1:
+        parser.error('--tamanho-bloco deve ser maior ou igual a 1')
+    if args.workers < 1:
+        parser.error('--workers deve ser maior ou igual a 1')
+    if args.dpi is not None and args.dpi < 1:
+        parser.error('--dpi deve ser maior ou igual a 1')
+
+    executadas = executar_analise(forcar=args.forcar, tamanho_bloco=args.tamanho_bloco,
+                                  workers=args.workers, formato=args.formato, dpi=args.dpi)
 
-print("\nAnálise exploratória concluída. As visualizações e estatísticas foram salvas.")
+    if executadas:
+        print("\nAnálise exploratória concluída. As visualizações e estatísticas foram salvas.")
+    else:
+        print("Análise exploratória já está atualizada; nenhuma etapa foi refeita.")
 
-# Salvando o dataset limpo
-df_clean.to_csv('framingham_clean.csv', index=False)
-print("Dataset limpo salvo como 'framingham_clean.csv'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import gerador_relatorio_pdf_simplificado as gerador
+from gerador_relatorio_pdf_simplificado import RelatorioRiscoCardiaco
+from populacao import obter_contexto
+from risco_cardiaco import COLUNAS_PACIENTE
+
+# Etapas medidas: funções do módulo gerador e métodos do relatório
+FUNCOES_MEDIDAS = ['calcular_risco_simplificado', 'criar_grafico_radar', 'criar_grafico_comparativo']
+METODOS_MEDIDOS = ['desenhar_radar_vetorial', 'desenhar_comparativo_vetorial', 'gerar_pagina_resumo',
+                   'gerar_pagina_detalhes', 'gerar_pagina_visualizacoes', 'gerar_pagina_recomendacoes', 'output']
+
+# Pacientes usados para medir a perda de qualidade das imagens codificadas
+PACIENTES_QUALIDADE = 5
+
+def gerar_pacientes_sinteticos(n, semente=0):
+    """
+    Gera n pacientes sorteando cada coluna da distribuição observada na população
+    """
+    df_pop = obter_contexto().df
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({coluna: rng.choice(df_pop[coluna].to_numpy(), size=n) for coluna in COLUNAS_PACIENTE})
+
+def _cronometrar(funcao, tempos):
+    """
+    Envolve uma função registrando a duração de cada chamada em tempos
+    """
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            tempos.append(time.perf_counter() - inicio)
+    return envolvida
+
+def decodificar_imagem(imagem):
+    """
+    Pixels RGB de uma imagem no formato do FPDF (ver gerador.codificar_imagem)
+    """
+    if imagem['f'] == 'DCTDecode':
+        from PIL import Image
+        return np.asarray(Image.open(io.BytesIO(imagem['data'])).convert('RGB'))
+    dados = np.frombuffer(zlib.decompress(imagem['data']), dtype=np.uint8)
+    if imagem['cs'] == 'Indexed':
+        dados = np.frombuffer(imagem['pal'], dtype=np.uint8).reshape(-1, 3)[dados]
+    return dados.reshape(imagem['h'], imagem['w'], 3)
+
+def medir_qualidade_imagens(pacientes, perfil='completo', imagens=None):
+    """
+    Gera os relatórios (com gráficos do matplotlib) dos pacientes e compara cada imagem
+    codificada com os pixels renderizados. Devolve o tamanho médio das imagens, sua
+    resolução e o PSNR médio e mínimo (None se a codificação for sem perdas).
+    """
+    medidas = []
+    codificar_original = gerador.codificar_imagem
+
+    def codificar_medindo(pixels, opcoes=None):
+        imagem = codificar_original(pixels, opcoes)
+        erro = np.mean((decodificar_imagem(imagem).astype(float) - pixels) ** 2)
+        medidas.append((len(imagem['data']) + len(imagem.get('pal', b'')), pixels.shape[1], pixels.shape[0],
+                        10 * np.log10(255 ** 2 / erro) if erro > 0 else None))
+        return imagem
+
+    gerador.codificar_imagem = codificar_medindo
+    try:
+        for i, (_, dados) in enumerate(pacientes.iterrows()):
+            RelatorioRiscoCardiaco(f'Qualidade_{i+1}', dados, graficos='matplotlib', perfil=perfil,
+                                   imagens=imagens).gerar_pdf()
+    finally:
+        gerador.codificar_imagem = codificar_original
+    if not medidas:
+        return None
+
+    psnr = [medida[3] for medida in medidas if medida[3] is not None]
+    return {
+        'imagens': len(medidas),
+        'bytes_por_imagem': float(np.mean([medida[0] for medida in medidas])),
+        'resolucao': sorted({f'{medida[1]}x{medida[2]}' for medida in medidas}),
+        'psnr_medio_db': float(np.mean(psnr)) if psnr else None,
+        'psnr_minimo_db': float(np.min(psnr)) if psnr else None
+    }
+
+def executar_benchmark(n, semente=0, aquecimento=1, graficos='vetorial', perfil='completo', imagens=None):
+    """
+    Gera n relatórios sintéticos e devolve vazão, latências por etapa, tamanho dos
+    PDFs, qualidade das imagens (gráficos do matplotlib) e pico de memória
+    """
+    if n < 1 or aquecimento < 0:
+        raise ValueError(f'São necessários n >= 1 e aquecimento >= 0 (recebidos: {n} e {aquecimento})')
+    imagens = gerador.validar_opcoes_imagem(imagens)
+    contexto = obter_contexto().carregar()
+    pacientes = gerar_pacientes_sinteticos(n + aquecimento, semente)
+
+    tempos = {etapa: [] for etapa in FUNCOES_MEDIDAS + METODOS_MEDIDOS + ['relatorio']}
+    tamanhos = []
+    originais_funcoes = {nome: getattr(gerador, nome) for nome in FUNCOES_MEDIDAS}
+    originais_metodos = {nome: getattr(RelatorioRiscoCardiaco, nome) for nome in METODOS_MEDIDOS}
+
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as diretorio:
+        try:
+            for nome, funcao in originais_funcoes.items():
+                setattr(gerador, nome, _cronometrar(funcao, tempos[nome]))
+            for nome, metodo in originais_metodos.items():
+                setattr(RelatorioRiscoCardiaco, nome, _cronometrar(metodo, tempos[nome]))
+
+            # Os PDFs são gravados em um diretório temporário (dados já carregados em memória)
+            os.chdir(diretorio)
+            for i, (_, dados) in enumerate(pacientes.iterrows()):
+                if i == aquecimento:
+                    # Descartar as medições do aquecimento (imports, caches de fontes)
+                    for lista in tempos.values():
+                        lista.clear()
+                    tamanhos.clear()
+                    inicio_total = time.perf_counter()
+                inicio = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    nome_arquivo = RelatorioRiscoCardiaco(f'Sintetico_{i+1}', dados, graficos=graficos, perfil=perfil,
+                                                          imagens=imagens).gerar_relatorio()
+                tempos['relatorio'].append(time.perf_counter() - inicio)
+                tamanhos.append(os.path.getsize(nome_arquivo))
+            tempo_total = time.perf_counter() - inicio_total
+        finally:
+            os.chdir(diretorio_original)
+            for nome, funcao in originais_funcoes.items():
+                setattr(gerador, nome, funcao)
+            for nome, metodo in originais_metodos.items():
+                setattr(RelatorioRiscoCardiaco, nome, metodo)
+
+    etapas = {}
+    for etapa, duracoes in tempos.items():
+        if not duracoes:
+            continue
+        ms = np.array(duracoes) * 1000
+        etapas[etapa] = {
+            'chamadas': len(ms),
+            'media_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+            'total_s': float(ms.sum() / 1000)
+        }
+
+    # Qualidade medida fora do cronômetro: a comparação de pixels é mais lenta que a codificação
+    qualidade = None
+    if graficos == 'matplotlib':
+        qualidade = medir_qualidade_imagens(pacientes.iloc[aquecimento:aquecimento + PACIENTES_QUALIDADE],
+                                            perfil, imagens)
+
+    # ru_maxrss é informado em KB no Linux
+    pico_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'n_pacientes': n,
+        'semente': semente,
+        'graficos': graficos,
+        'perfil': perfil,
+        'imagens': imagens if graficos == 'matplotlib' else None,
+        'python': sys.version.split()[0],
+        'plataforma': platform.platform(),
+        'populacao_sha256': contexto.impressao_digital,
+        'tempo_total_s': tempo_total,
+        'relatorios_por_segundo': n / tempo_total if tempo_total > 0 else None,
+        'pico_rss_mb': pico_rss_mb,
+        'bytes_por_relatorio': {
+            'media': float(np.mean(tamanhos)),
+            'p50': float(np.percentile(tamanhos, 50)),
+            'maximo': int(max(tamanhos)),
+            'total': int(sum(tamanhos))
+        },
+        'qualidade_imagens': qualidade,
+        'etapas': etapas
+    }
+
+def imprimir_resultados(resultados, base=None):
+    """
+    Exibe os resultados do benchmark, com a variação do p50 em relação a uma execução base
+    """
+    print(f"\nRelatórios: {resultados['n_pacientes']} em {resultados['tempo_total_s']:.2f} s "
+          f"({resultados['relatorios_por_segundo']:.2f} relatórios/s)")
+    print(f"Pico de memória (RSS): {resultados['pico_rss_mb']:.1f} MB")
+
+    # Execuções anteriores ao registro dos tamanhos não têm esses campos
+    tamanho = resultados['bytes_por_relatorio']
+    variacao = ''
+    if base and base.get('bytes_por_relatorio'):
+        variacao = f" ({tamanho['media'] / base['bytes_por_relatorio']['media'] - 1:+.0%} em relação à base)"
+    print(f"Tamanho por relatório: média {tamanho['media'] / 1024:.1f} KB, máximo {tamanho['maximo'] / 1024:.1f} KB, "
+          f"total {tamanho['total'] / 1024 / 1024:.2f} MB{variacao}")
+    qualidade = resultados.get('qualidade_imagens')
+    if qualidade:
+        psnr = 'sem perdas' if qualidade['psnr_medio_db'] is None else \
+            f"PSNR médio {qualidade['psnr_medio_db']:.1f} dB, mínimo {qualidade['psnr_minimo_db']:.1f} dB"
+        print(f"Imagens: {qualidade['bytes_por_imagem'] / 1024:.1f} KB em média, "
+              f"{', '.join(qualidade['resolucao'])} pixels, {psnr}")
+
+    print(f"\n{'Etapa':<30}{'Chamadas':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Variação':>10}")
+    for etapa, medidas in resultados['etapas'].items():
+        variacao = ''
+        if base and etapa in base['etapas'] and base['etapas'][etapa]['p50_ms'] > 0:
+            delta = medidas['p50_ms'] / base['etapas'][etapa]['p50_ms'] - 1
+            variacao = f'{delta:+.0%}'
+        print(f"{etapa:<30}{medidas['chamadas']:>9}{medidas['p50_ms']:>10.1f}"
+              f"{medidas['p95_ms']:>10.1f}{medidas['p99_ms']:>10.1f}{variacao:>10}")
+
+    if base and base.get('relatorios_por_segundo'):
+        delta = resultados['relatorios_por_segundo'] / base['relatorios_por_segundo'] - 1
+        print(f"\nVazão em relação à base ({base['data']}): {delta:+.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da geração de relatórios de risco cardiovascular')
+    parser.add_argument('-n', '--pacientes', type=int, default=20,
+                      help='Número de pacientes sintéticos')
+    parser.add_argument('-s', '--semente', type=int, default=0,
+                      help='Semente do gerador de pacientes sintéticos')
+    parser.add_argument('-a', '--aquecimento', type=int, default=1,
+                      help='Relatórios gerados antes das medições')
+    parser.add_argument('-g', '--graficos', choices=['vetorial', 'matplotlib'], default='vetorial',
+                      help='Forma de desenhar os gráficos dos relatórios')
+    parser.add_argument('-p', '--perfil-relatorio', choices=['completo', 'triagem'], default='completo',
+                      help='Perfil (páginas) dos relatórios')
+    parser.add_argument('--dpi-graficos', type=int, metavar='DPI',
+                      help='Resolução das imagens dos gráficos na página (com -g matplotlib)')
+    parser.add_argument('--codificacao-graficos', choices=['rgb', 'paleta', 'jpeg'],
+                      help='Codificação das imagens dos gráficos (com -g matplotlib)')
+    parser.add_argument('--compressao-graficos', type=int, metavar='NIVEL',
+                      help='Nível de compressão zlib das imagens, de 0 a 9 (com -g matplotlib)')
+    parser.add_argument('--qualidade-jpeg', type=int, metavar='QUALIDADE',
+                      help='Qualidade das imagens jpeg, de 1 a 95 (com -g matplotlib)')
+    parser.add_argument('-o', '--saida', type=str,
+                      help='Arquivo JSON para salvar os resultados')
+    parser.add_argument('-b', '--base', type=str,
+                      help='Arquivo JSON de uma execução anterior para comparação')
+    args = parser.parse_args()
+
+    if args.pacientes < 1:
+        parser.error('--pacientes deve ser maior ou igual a 1')
+    if args.aquecimento < 0:
+        parser.error('--aquecimento deve ser maior ou igual a 0')
+    imagens = {opcao: valor for opcao, valor in (('dpi', args.dpi_graficos),
+                                                 ('codificacao', args.codificacao_graficos),
+                                                 ('compressao', args.compressao_graficos),
+                                                 ('qualidade', args.qualidade_jpeg)) if valor is not None}
+    if imagens and args.graficos != 'matplotlib':
+        parser.error('as opções de imagem requerem -g matplotlib')
+    try:
+        gerador.validar_opcoes_imagem(imagens)
+    except ValueError as e:
+        parser.error(str(e))
+
+    base = None
+    if args.base:
+        with open(args.base, 'r') as f:
+            base = json.load(f)
+
+    resultados = executar_benchmark(args.pacientes, args.semente, args.aquecimento, args.graficos,
+                                    args.perfil_relatorio, imagens)
+    imprimir_resultados(resultados, base)
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(resultados, f, indent=4)
+        print(f"\nResultados salvos em: {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import filecmp
+import hashlib
+import json
+import numbers
+import os
+import shutil
+from populacao import calcular_impressao_digital, obter_contexto
+
+# Código-fonte que determina o conteúdo dos relatórios: qualquer alteração invalida o cache
+ARQUIVOS_CODIGO = ['gerador_relatorio_pdf_simplificado.py', 'risco_cardiaco.py', 'populacao.py']
+
+class CacheRelatorios:
+    """
+    Cache de relatórios PDF endereçado pelo conteúdo: a chave é o hash dos dados
+    do paciente, das opções do relatório e das versões da população, das
+    estatísticas e do código. Entradas menos usadas são removidas quando o
+    diretório passa do tamanho máximo. O último uso de cada entrada é marcado
+    num arquivo à parte, pois o PDF compartilha o inode com os relatórios de
+    saída ligados a ele e alterar suas datas alteraria também as desses arquivos.
+    A marca guarda também o último arquivo de saída da entrada, reaproveitado
+    enquanto existir com o mesmo conteúdo, em vez de criar uma nova cópia.
+    """
+    def __init__(self, diretorio='.cache_relatorios', tamanho_maximo_mb=1024):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo_mb * 1024 * 1024
+        self._versoes = None
+        os.makedirs(diretorio, exist_ok=True)
+
+    def __getstate__(self):
+        # As versões são recalculadas em cada processo do pool
+        estado = self.__dict__.copy()
+        estado['_versoes'] = None
+        return estado
+
+    def versoes(self):
+        """
+        Impressões digitais da população, das estatísticas e do código dos relatórios
+        """
+        if self._versoes is None:
+            contexto = obter_contexto()
+            diretorio_codigo = os.path.dirname(os.path.abspath(__file__))
+            self._versoes = {
+                'populacao': contexto.impressao_digital,
+                'estatisticas': calcular_impressao_digital(contexto.caminho_estatisticas),
+                'codigo': [calcular_impressao_digital(os.path.join(diretorio_codigo, arquivo))
+                           for arquivo in ARQUIVOS_CODIGO]
+            }
+        return self._versoes
+
+    def chave(self, nome_paciente, dados_paciente, parametros):
+        """
+        Calcula a chave do relatório de um paciente
+        """
+        dados = {str(campo): float(valor) if isinstance(valor, numbers.Number) else str(valor)
+                 for campo, valor in dict(dados_paciente).items()}
+        conteudo = {
+            'nome': str(nome_paciente),
+            'dados': dados,
+            'parametros': parametros,
+            'versoes': self.versoes()
+        }
+        texto = json.dumps(conteudo, sort_keys=True, default=str)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.pdf')
+
+    def _marca(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.uso')
+
+    def _marcar_uso(self, chave, saida=None):
+        # Atualiza a marca de uso para a política de remoção (menos usado recentemente),
+        # registrando o arquivo de saída, se houver
+        marca = self._marca(chave)
+        if saida is not None:
+            with open(marca, 'w', encoding='utf-8') as f:
+                f.write(os.path.abspath(saida))
+            return
+        try:
+            os.utime(marca)
+        except FileNotFoundError:
+            with open(marca, 'w', encoding='utf-8'):
+                pass
+
+    def _saida_anterior(self, chave):
+        try:
+            with open(self._marca(chave), 'r', encoding='utf-8') as f:
+                return f.read() or None
+        except FileNotFoundError:
+            return None
+
+    def obter(self, chave, destino):
+        """
+        Se o relatório estiver no cache, devolve o arquivo de saída: o criado antes
+        para a mesma chave no diretório de destino, se ainda tiver o mesmo conteúdo,
+        ou destino, criado a partir do cache. Devolve None se não estiver no cache.
+        """
+        caminho = self._caminho(chave)
+        if not os.path.exists(caminho):
+            return None
+        anterior = self._saida_anterior(chave)
+        if anterior is not None and os.path.dirname(anterior) == os.path.dirname(os.path.abspath(destino)) \
+                and _mesmo_conteudo(anterior, caminho):
+            self._marcar_uso(chave)
+            return os.path.join(os.path.dirname(destino), os.path.basename(anterior))
+        _vincular(caminho, destino)
+        self._marcar_uso(chave, destino)
+        return destino
+
+    def guardar(self, chave, origem):
+        """
+        Adiciona ao cache o relatório gerado em origem
+        """
+        temporario = f'{self._caminho(chave)}.{os.getpid()}.tmp'
+        _vincular(origem, temporario)
+        os.replace(temporario, self._caminho(chave))
+        self._marcar_uso(chave, origem)
+
+    def ler(self, chave):
+        """
+        Devolve o conteúdo do relatório guardado no cache (bytes), ou None se não houver
+        """
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as f:
+                pdf = f.read()
+        except FileNotFoundError:
+            return None
+        self._marcar_uso(chave)
+        return pdf
+
+    def guardar_pdf(self, chave, pdf):
+        """
+        Adiciona ao cache o conteúdo (bytes) de um relatório gerado em memória
+        """
+        temporario = f'{self._caminho(chave)}.{os.getpid()}.tmp'
+        with open(temporario, 'wb') as f:
+            f.write(pdf)
+        os.replace(temporario, self._caminho(chave))
+        self._marcar_uso(chave)
+
+    def limpar(self):
+        """
+        Remove as entradas usadas há mais tempo até o cache caber no tamanho máximo
+        """
+        entradas = [entrada for entrada in os.scandir(self.diretorio)
+                    if entrada.is_file() and entrada.name.endswith('.pdf')]
+        total = sum(entrada.stat().st_size for entrada in entradas)
+        removidas = 0
+        for entrada in sorted(entradas, key=self._ultimo_uso):
+            if total <= self.tamanho_maximo:
+                break
+            total -= entrada.stat().st_size
+            os.remove(entrada.path)
+            _remover(f'{entrada.path[:-len(".pdf")]}.uso')
+            removidas += 1
+        return removidas
+
+    @staticmethod
+    def _ultimo_uso(entrada):
+        # Entradas sem marca de uso (ex.: de versões anteriores do cache) usam a data do PDF
+        try:
+            return os.stat(f'{entrada.path[:-len(".pdf")]}.uso').st_mtime
+        except FileNotFoundError:
+            return entrada.stat().st_mtime
+
+def _mesmo_conteudo(caminho, caminho_cache):
+    """
+    Verifica se o arquivo existe e é o do cache (link físico) ou uma cópia idêntica
+    """
+    try:
+        return os.path.samefile(caminho, caminho_cache) or filecmp.cmp(caminho, caminho_cache, shallow=False)
+    except FileNotFoundError:
+        return False
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+def _vincular(origem, destino):
+    """
+    Cria destino como link físico de origem (ou cópia, se links não forem suportados)
+    """
+    if os.path.exists(destino):
+        os.remove(destino)
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
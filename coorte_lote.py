@@ -0,0 +1,282 @@
+import json
+from datetime import datetime
+import numpy as np
+from fpdf import FPDF
+from estatisticas_blocos import AcumuladorMomentos
+from populacao import COLUNAS_PERCENTIL, obter_contexto
+from risco_cardiaco import calcular_risco_lote
+
+# Categorias de risco, na ordem de exibição
+CATEGORIAS_RISCO = ['Baixo', 'Moderado', 'Alto']
+
+# Faixas do índice de risco no histograma da coorte
+BORDAS_INDICE = np.linspace(0, 1, 11).round(1)
+
+# Fatores de risco contados na coorte: os mesmos critérios das recomendações
+# específicas e dos indicadores dos relatórios individuais
+FATORES_RISCO = {
+    'Pressão arterial elevada (> 120/80 mmHg)': lambda df: (df['sysBP'] > 120) | (df['diaBP'] > 80),
+    'Colesterol elevado (> 200 mg/dL)': lambda df: df['totChol'] > 200,
+    'IMC elevado (> 25)': lambda df: df['BMI'] > 25,
+    'Glicose elevada (> 100 mg/dL)': lambda df: df['glucose'] > 100,
+    'Tabagismo': lambda df: (df['currentSmoker'] == 1) | (df['cigsPerDay'] > 0),
+    'Hipertensão': lambda df: df['prevalentHyp'] == 1,
+    'Uso de medicação para PA': lambda df: df['BPMeds'] == 1,
+    'Diabetes': lambda df: df['diabetes'] == 1,
+    'Histórico de AVC': lambda df: df['prevalentStroke'] == 1
+}
+
+# Nomes legíveis dos fatores numéricos comparados com a população
+NOMES_FATORES = {
+    'age': 'Idade',
+    'sysBP': 'Pressão Sistólica',
+    'diaBP': 'Pressão Diastólica',
+    'BMI': 'IMC',
+    'glucose': 'Glicose',
+    'totChol': 'Colesterol Total',
+    'heartRate': 'Frequência Cardíaca'
+}
+
+def contar_fatores(df):
+    """
+    Número de pacientes de um DataFrame com cada fator de risco
+    """
+    return np.array([int(criterio(df).sum()) for criterio in FATORES_RISCO.values()])
+
+class ResumoCoorte:
+    """
+    Agregados de uma coorte acumulados bloco a bloco, com memória constante:
+    contagem por categoria de risco, histograma do índice, número de pacientes com
+    cada fator de risco, momentos dos fatores numéricos e soma dos percentis de
+    cada paciente na população de referência.
+    """
+    def __init__(self):
+        self.n = 0
+        self.categorias = dict.fromkeys(CATEGORIAS_RISCO, 0)
+        self.histograma = np.zeros(len(BORDAS_INDICE) - 1, dtype=int)
+        self.soma_indice = 0.0
+        self.masculino = 0
+        self.fatores = np.zeros(len(FATORES_RISCO), dtype=int)
+        self.momentos = AcumuladorMomentos(COLUNAS_PERCENTIL)
+        self.soma_percentis = np.zeros(len(COLUNAS_PERCENTIL))
+        self.n_percentis = np.zeros(len(COLUNAS_PERCENTIL))
+
+    def atualizar(self, dados, escores, percentis=None):
+        """
+        Incorpora um bloco de pacientes válidos: dados numéricos, escores de
+        calcular_risco_lote e, opcionalmente, as colunas percentil_<fator>
+        """
+        if len(dados) == 0:
+            return
+        self.n += len(dados)
+        contagens = escores['categoria_risco'].value_counts()
+        for categoria in CATEGORIAS_RISCO:
+            self.categorias[categoria] += int(contagens.get(categoria, 0))
+        indices = escores['probabilidade_risco'].to_numpy(dtype=float)
+        self.histograma += np.histogram(np.clip(indices, 0, 1), bins=BORDAS_INDICE)[0]
+        self.soma_indice += float(indices.sum())
+        self.masculino += int((dados['male'] == 1).sum())
+        self.fatores += contar_fatores(dados)
+        self.momentos.atualizar(dados[COLUNAS_PERCENTIL].to_numpy(dtype=float))
+        if percentis is not None:
+            valores = percentis[[f'percentil_{coluna}' for coluna in COLUNAS_PERCENTIL]].to_numpy(dtype=float)
+            self.soma_percentis += np.nansum(valores, axis=0)
+            self.n_percentis += (~np.isnan(valores)).sum(axis=0)
+
+    def resultado(self, **informacoes):
+        """
+        Resumo da coorte comparado à população de referência, pronto para JSON
+        """
+        contexto = obter_contexto()
+        populacao = contexto.df
+        escores_populacao = calcular_risco_lote(populacao)
+        categorias_populacao = escores_populacao['categoria_risco'].value_counts(normalize=True)
+        fatores_populacao = contar_fatores(populacao) / len(populacao)
+
+        def proporcao(contagem):
+            return contagem / self.n if self.n else None
+
+        fatores = sorted(({
+            'fator': fator,
+            'pacientes': int(contagem),
+            'proporcao': proporcao(int(contagem)),
+            'proporcao_populacao': float(prevalencia)
+        } for fator, contagem, prevalencia in zip(FATORES_RISCO, self.fatores, fatores_populacao)),
+            key=lambda fator: -fator['pacientes'])
+
+        desvios = self.momentos.desvios()
+        comparacao = {}
+        for i, coluna in enumerate(COLUNAS_PERCENTIL):
+            presentes = self.momentos.n[i] > 0
+            comparacao[coluna] = {
+                'media': float(self.momentos.media[i]) if presentes else None,
+                'desvio': None if np.isnan(desvios[i]) else float(desvios[i]),
+                'minimo': float(self.momentos.minimo[i]) if presentes else None,
+                'maximo': float(self.momentos.maximo[i]) if presentes else None,
+                'media_populacao': float(contexto.resumo['medias'][coluna]),
+                'percentil_medio': float(self.soma_percentis[i] / self.n_percentis[i]) if self.n_percentis[i] else None
+            }
+
+        return dict(informacoes, **{
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'populacao_sha256': contexto.impressao_digital,
+            'pacientes': self.n,
+            'sexo': {'masculino': self.masculino, 'feminino': self.n - self.masculino},
+            'categorias': {categoria: {
+                'pacientes': contagem,
+                'proporcao': proporcao(contagem),
+                'proporcao_populacao': float(categorias_populacao.get(categoria, 0.0))
+            } for categoria, contagem in self.categorias.items()},
+            'indice_risco': {
+                'media': proporcao(self.soma_indice),
+                'media_populacao': float(escores_populacao['probabilidade_risco'].mean()),
+                'bordas': BORDAS_INDICE.tolist(),
+                'contagens': self.histograma.tolist()
+            },
+            'fatores_risco': fatores,
+            'comparacao_populacao': comparacao
+        })
+
+    def salvar(self, caminho_json, caminho_pdf, **informacoes):
+        """
+        Grava o resumo da coorte em JSON e em PDF e devolve o resumo
+        """
+        resultado = self.resultado(**informacoes)
+        with open(caminho_json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=4, ensure_ascii=False)
+        relatorio = RelatorioCoorte(resultado)
+        relatorio.gerar_paginas()
+        relatorio.output(caminho_pdf)
+        return resultado
+
+class RelatorioCoorte(FPDF):
+    """
+    PDF com o resumo de uma coorte (ver ResumoCoorte.resultado), com tabelas e
+    barras desenhadas diretamente no PDF
+    """
+    def __init__(self, resultado):
+        super().__init__()
+        self.resultado = resultado
+        self.set_auto_page_break(auto=True, margin=15)
+
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'Resumo da Coorte - Risco Cardiovascular', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+    def linha_tabela(self, valores, larguras, negrito=False):
+        self.set_font('Arial', 'B' if negrito else '', 10)
+        for i, (valor, largura) in enumerate(zip(valores, larguras)):
+            self.cell(largura, 7, valor, 1, 1 if i == len(valores) - 1 else 0, 'L' if i == 0 else 'C')
+
+    def barra(self, x, y, largura_maxima, proporcao, cor):
+        self.set_fill_color(*cor)
+        self.rect(x, y, max(largura_maxima * (proporcao or 0), 0.3), 3, 'F')
+
+    def gerar_pagina_categorias(self):
+        resultado = self.resultado
+        self.add_page()
+        self.set_font('Arial', 'B', 16)
+        self.cell(0, 10, 'Visão Geral', 0, 1, 'L')
+        self.set_font('Arial', '', 10)
+        if resultado.get('entrada'):
+            self.cell(0, 6, f"Arquivo: {resultado['entrada']}", 0, 1, 'L')
+        self.cell(0, 6, f"Data: {datetime.now().strftime('%d/%m/%Y')}", 0, 1, 'L')
+        self.cell(0, 6, f"Pacientes avaliados: {resultado['pacientes']} "
+                        f"({resultado['sexo']['feminino']} mulheres, {resultado['sexo']['masculino']} homens)", 0, 1, 'L')
+        if resultado.get('rejeitadas'):
+            self.cell(0, 6, f"Linhas rejeitadas na validação: {resultado['rejeitadas']}", 0, 1, 'L')
+        indice = resultado['indice_risco']
+        if indice['media'] is not None:
+            self.cell(0, 6, f"Índice de risco médio: {indice['media']:.0%} "
+                            f"(população de referência: {indice['media_populacao']:.0%})", 0, 1, 'L')
+
+        # Distribuição das categorias na coorte e na população
+        self.ln(5)
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Categorias de Risco:', 0, 1, 'L')
+        larguras = [40, 30, 30, 30, 60]
+        self.linha_tabela(['Categoria', 'Pacientes', 'Coorte', 'População', ''], larguras, negrito=True)
+        for categoria, valores in resultado['categorias'].items():
+            y = self.get_y()
+            proporcao = '-' if valores['proporcao'] is None else f"{valores['proporcao']:.0%}"
+            self.linha_tabela([categoria, str(valores['pacientes']), proporcao,
+                               f"{valores['proporcao_populacao']:.0%}", ''], larguras)
+            # Barras da coorte (vermelho) e da população (azul) na última coluna
+            x = self.l_margin + sum(larguras[:-1]) + 2
+            self.barra(x, y + 0.3, larguras[-1] - 4, valores['proporcao'], (220, 60, 60))
+            self.barra(x, y + 3.7, larguras[-1] - 4, valores['proporcao_populacao'], (70, 110, 200))
+        self.set_fill_color(255, 255, 255)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 6, 'Barras: coorte (vermelho) e população de referência (azul)', 0, 1, 'R')
+
+        # Histograma do índice de risco em faixas de 10%
+        self.ln(5)
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Distribuição do Índice de Risco:', 0, 1, 'L')
+        maximo = max(indice['contagens']) or 1
+        x0, y0, altura, largura = self.l_margin + 10, self.get_y() + 2, 60, 160 / len(indice['contagens'])
+        self.set_font('Arial', '', 8)
+        self.set_fill_color(220, 60, 60)
+        for i, contagem in enumerate(indice['contagens']):
+            altura_barra = altura * contagem / maximo
+            x = x0 + i * largura
+            if contagem:
+                self.rect(x + 1, y0 + altura - altura_barra, largura - 2, altura_barra, 'F')
+                self.text(x + 2, y0 + altura - altura_barra - 1, str(contagem))
+            self.text(x + 1, y0 + altura + 4, f"{indice['bordas'][i]:.0%}-{indice['bordas'][i + 1]:.0%}")
+        self.line(x0, y0 + altura, x0 + 160, y0 + altura)
+        self.set_fill_color(255, 255, 255)
+        self.set_y(y0 + altura + 8)
+
+    def gerar_pagina_fatores(self):
+        resultado = self.resultado
+        self.add_page()
+        self.set_font('Arial', 'B', 16)
+        self.cell(0, 10, 'Fatores de Risco e Comparação com a População', 0, 1, 'L')
+        self.ln(3)
+
+        # Fatores de risco mais frequentes na coorte
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Fatores de Risco mais Frequentes:', 0, 1, 'L')
+        larguras = [85, 30, 35, 35]
+        self.linha_tabela(['Fator', 'Pacientes', 'Coorte', 'População'], larguras, negrito=True)
+        for fator in resultado['fatores_risco']:
+            proporcao = '-' if fator['proporcao'] is None else f"{fator['proporcao']:.0%}"
+            self.linha_tabela([fator['fator'], str(fator['pacientes']), proporcao,
+                               f"{fator['proporcao_populacao']:.0%}"], larguras)
+
+        # Médias da coorte e da população e percentil médio dos pacientes
+        self.ln(8)
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Fatores Numéricos:', 0, 1, 'L')
+        larguras = [50, 35, 35, 35, 35]
+        self.linha_tabela(['Fator', 'Média Coorte', 'Média População', 'Desvio Coorte', 'Percentil Médio'],
+                          larguras, negrito=True)
+        for coluna, valores in resultado['comparacao_populacao'].items():
+            self.linha_tabela([
+                NOMES_FATORES.get(coluna, coluna),
+                '-' if valores['media'] is None else f"{valores['media']:.1f}",
+                f"{valores['media_populacao']:.1f}",
+                '-' if valores['desvio'] is None else f"{valores['desvio']:.1f}",
+                '-' if valores['percentil_medio'] is None else f"{valores['percentil_medio']:.0f}º"
+            ], larguras)
+        self.set_font('Arial', 'I', 8)
+        self.multi_cell(0, 5, 'O percentil médio é a média dos percentis de cada paciente na população de '
+                              'referência: valores acima de 50 indicam uma coorte com valores mais altos que a população.')
+
+        self.ln(5)
+        self.multi_cell(0, 5,
+            "AVISO: Este resumo é baseado em análise estatística e deve ser usado apenas " +
+            "como uma ferramenta auxiliar. Consulte sempre um profissional de saúde para " +
+            "avaliação completa e recomendações personalizadas."
+        )
+
+    def gerar_paginas(self):
+        self.gerar_pagina_categorias()
+        self.gerar_pagina_fatores()
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from populacao import calcular_impressao_digital
+
+# Os registros são sincronizados com o disco (fsync) em grupos: a cada tantos
+# registros ou segundos, e sempre ao fechar o diário
+REGISTROS_POR_FSYNC = 100
+SEGUNDOS_POR_FSYNC = 1.0
+
+class DiarioLote:
+    """
+    Diário de um lote de relatórios em JSON lines: a primeira linha identifica o
+    arquivo de entrada e as opções do lote, e cada linha seguinte registra um
+    paciente processado (linha do CSV, nome, arquivo gerado ou erro). Cada registro
+    é enviado ao sistema operacional ao ser gravado e sincronizado com o disco em
+    grupos, para que um lote interrompido possa ser retomado a partir do diário;
+    uma queda da máquina perde no máximo o último grupo, que é gerado de novo.
+    """
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+        self._pendentes = 0
+        self._ultimo_fsync = time.monotonic()
+
+    @staticmethod
+    def caminho_padrao(arquivo_csv):
+        # No diretório atual, junto dos relatórios, e não ao lado da entrada (que pode ser somente leitura)
+        return f'{os.path.basename(arquivo_csv)}.diario.jsonl'
+
+    @staticmethod
+    def cabecalho(arquivo_csv, coluna_nome, parametros):
+        """
+        Identificação do lote: um diário só pode ser retomado com a mesma entrada e as mesmas opções
+        """
+        return {
+            'tipo': 'lote',
+            'entrada_sha256': calcular_impressao_digital(arquivo_csv),
+            'coluna_nome': coluna_nome,
+            'parametros': parametros
+        }
+
+    def iniciar(self, cabecalho):
+        """
+        Começa um diário novo (substituindo o anterior, se houver)
+        """
+        self._arquivo = open(self.caminho, 'w', encoding='utf-8')
+        self._gravar(cabecalho)
+        self._sincronizar()
+
+    def retomar(self, cabecalho):
+        """
+        Reabre um diário existente para continuar o lote e devolve os registros já
+        gravados. Gera ValueError se o diário for de outra entrada ou de outras opções.
+        """
+        cabecalho_anterior, registros = self.ler()
+        if cabecalho_anterior != cabecalho:
+            raise ValueError(f"O diário '{self.caminho}' foi criado para outro arquivo ou outras opções")
+        # Descartar um registro incompleto deixado por uma interrupção no meio da gravação
+        with open(self.caminho, 'rb+') as f:
+            conteudo = f.read()
+            f.truncate(conteudo.rfind(b'\n') + 1)
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        return registros
+
+    def registros(self):
+        """
+        Percorre o diário sem carregá-lo na memória: o cabeçalho e depois cada registro
+        """
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for texto in f:
+                if not texto.endswith('\n'):
+                    break
+                yield json.loads(texto)
+
+    def ler(self):
+        """
+        Devolve o cabeçalho e os registros do diário ({linha: último registro da linha})
+        """
+        cabecalho = None
+        registros = {}
+        for registro in self.registros():
+            if cabecalho is None:
+                cabecalho = registro
+            else:
+                registros[registro['linha']] = registro
+        return cabecalho, registros
+
+    def contar(self):
+        """
+        Conta as linhas cujo último registro é um relatório gerado e as com erro,
+        percorrendo o diário com um byte de estado por linha do CSV
+        """
+        estados = bytearray()
+        registros = self.registros()
+        next(registros, None)
+        for registro in registros:
+            linha = registro['linha']
+            if linha >= len(estados):
+                estados.extend(bytes(linha + 1 - len(estados)))
+            estados[linha] = 1 if registro['erro'] is None else 2
+        return estados.count(1), estados.count(2)
+
+    def registrar(self, linha, nome, arquivo, erro=None):
+        self._gravar({'linha': int(linha), 'nome': str(nome), 'arquivo': arquivo, 'erro': erro})
+
+    def _gravar(self, registro):
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        self._arquivo.flush()
+        self._pendentes += 1
+        if self._pendentes >= REGISTROS_POR_FSYNC or time.monotonic() - self._ultimo_fsync >= SEGUNDOS_POR_FSYNC:
+            self._sincronizar()
+
+    def _sincronizar(self):
+        os.fsync(self._arquivo.fileno())
+        self._pendentes = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def fechar(self):
+        if self._arquivo is not None:
+            if self._pendentes:
+                self._sincronizar()
+            self._arquivo.close()
+            self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+def relatorios_concluidos(registros):
+    """
+    Linhas cujo relatório foi gerado e cujo arquivo ainda existe ({linha: registro})
+    """
+    return {linha: registro for linha, registro in registros.items()
+            if registro['erro'] is None and registro['arquivo'] and os.path.exists(registro['arquivo'])}
@@ -0,0 +1,235 @@
+import numpy as np
+from populacao import PONTOS_KDE
+
+# Número máximo de valores distintos guardados por esboço de quantis. Abaixo
+# desse limite os quantis são exatos; acima, o erro de posição fica em torno
+# de 2/CAPACIDADE_ESBOCO do número de valores.
+CAPACIDADE_ESBOCO = 20000
+
+# Acumuladores de estatísticas que podem ser atualizados bloco a bloco e
+# combinados entre si, para processar arquivos maiores que a memória
+
+class AcumuladorMomentos:
+    """
+    Contagem, média, soma dos quadrados dos desvios, mínimo e máximo de cada
+    coluna (combinação de blocos pelo algoritmo de Chan et al.). Nulos são ignorados.
+    """
+    def __init__(self, colunas):
+        self.colunas = list(colunas)
+        k = len(self.colunas)
+        self.n = np.zeros(k)
+        self.media = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.minimo = np.full(k, np.inf)
+        self.maximo = np.full(k, -np.inf)
+
+    def atualizar(self, valores):
+        """
+        Incorpora um bloco (matriz linhas x colunas)
+        """
+        valores = np.asarray(valores, dtype=float)
+        presentes = ~np.isnan(valores)
+        n = presentes.sum(axis=0).astype(float)
+        soma = np.where(presentes, valores, 0).sum(axis=0)
+        media = np.divide(soma, n, out=np.zeros_like(soma), where=n > 0)
+        m2 = np.where(presentes, (valores - media) ** 2, 0).sum(axis=0)
+        minimo = np.where(presentes, valores, np.inf).min(axis=0, initial=np.inf)
+        maximo = np.where(presentes, valores, -np.inf).max(axis=0, initial=-np.inf)
+        self._incorporar(n, media, m2, minimo, maximo)
+
+    def combinar(self, outro):
+        self._incorporar(outro.n, outro.media, outro.m2, outro.minimo, outro.maximo)
+
+    def _incorporar(self, n, media, m2, minimo, maximo):
+        total = self.n + n
+        delta = media - self.media
+        peso = np.divide(n, total, out=np.zeros_like(total), where=total > 0)
+        self.media = self.media + delta * peso
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * peso
+        self.n = total
+        self.minimo = np.minimum(self.minimo, minimo)
+        self.maximo = np.maximum(self.maximo, maximo)
+
+    def desvios(self):
+        """
+        Desvio padrão amostral (ddof=1) de cada coluna
+        """
+        return np.sqrt(np.divide(self.m2, self.n - 1, out=np.full_like(self.m2, np.nan), where=self.n > 1))
+
+    def medias(self):
+        return {coluna: float(v) for coluna, v in zip(self.colunas, self.media)}
+
+    def minimos(self):
+        return {coluna: float(v) for coluna, v in zip(self.colunas, self.minimo)}
+
+    def maximos(self):
+        return {coluna: float(v) for coluna, v in zip(self.colunas, self.maximo)}
+
+class AcumuladorCorrelacao:
+    """
+    Médias e matriz de co-momentos para a correlação de Pearson entre colunas.
+    Linhas com algum valor nulo são ignoradas.
+    """
+    def __init__(self, colunas):
+        self.colunas = list(colunas)
+        k = len(self.colunas)
+        self.n = 0
+        self.media = np.zeros(k)
+        self.comomentos = np.zeros((k, k))
+
+    def atualizar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores).any(axis=1)]
+        if len(valores) == 0:
+            return
+        media = valores.mean(axis=0)
+        desvios = valores - media
+        self._incorporar(len(valores), media, desvios.T @ desvios)
+
+    def combinar(self, outro):
+        if outro.n:
+            self._incorporar(outro.n, outro.media, outro.comomentos)
+
+    def _incorporar(self, n, media, comomentos):
+        total = self.n + n
+        delta = media - self.media
+        self.comomentos = self.comomentos + comomentos + np.outer(delta, delta) * self.n * n / total
+        self.media = self.media + delta * n / total
+        self.n = total
+
+    def correlacao(self):
+        """
+        Matriz de correlação de Pearson
+        """
+        desvios = np.sqrt(np.diag(self.comomentos))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.comomentos / np.outer(desvios, desvios)
+
+class EsbocoQuantis:
+    """
+    Esboço combinável para quantis de uma coluna: guarda os valores distintos
+    e suas frequências e, ao passar da capacidade, agrupa valores vizinhos em
+    centróides de peso limitado.
+    """
+    def __init__(self, capacidade=CAPACIDADE_ESBOCO):
+        self.capacidade = capacidade
+        self.valores = np.empty(0)
+        self.pesos = np.empty(0)
+        self.n = 0
+        self.exato = True
+
+    def atualizar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        valores, pesos = np.unique(valores[~np.isnan(valores)], return_counts=True)
+        self._incorporar(valores, pesos)
+
+    def combinar(self, outro):
+        self.exato = self.exato and outro.exato
+        self._incorporar(outro.valores, outro.pesos)
+
+    def _incorporar(self, valores, pesos):
+        valores, inverso = np.unique(np.concatenate([self.valores, valores]), return_inverse=True)
+        self.pesos = np.bincount(inverso, weights=np.concatenate([self.pesos, pesos]))
+        self.valores = valores
+        self.n = int(round(self.pesos.sum()))
+        if len(self.valores) > self.capacidade:
+            self._compactar()
+
+    def _compactar(self):
+        # Agrupar valores vizinhos de modo que cada grupo acumule no máximo ~2n/capacidade
+        limite = 2 * self.n / self.capacidade
+        grupos = np.floor((np.cumsum(self.pesos) - self.pesos) / limite).astype(int)
+        pesos = np.bincount(grupos, weights=self.pesos)
+        somas = np.bincount(grupos, weights=self.valores * self.pesos)
+        usados = pesos > 0
+        self.valores = somas[usados] / pesos[usados]
+        self.pesos = pesos[usados]
+        self.exato = False
+
+    def _valor_na_posicao(self, posicoes):
+        acumulado = np.cumsum(self.pesos)
+        return self.valores[np.searchsorted(acumulado, posicoes, side='right')]
+
+    def quantil(self, q):
+        """
+        Quantil com interpolação linear entre as estatísticas de ordem (como o pandas)
+        """
+        if self.n == 0:
+            return float('nan')
+        posicao = q * (self.n - 1)
+        anterior = np.floor(posicao)
+        seguinte = min(anterior + 1, self.n - 1)
+        v_anterior, v_seguinte = self._valor_na_posicao([anterior, seguinte])
+        return float(v_anterior + (v_seguinte - v_anterior) * (posicao - anterior))
+
+    def estatisticas_boxplot(self):
+        """
+        Quartis e limites dos bigodes (1,5 x IQR) no formato de Axes.bxp, sem pontos extremos
+        """
+        q1, mediana, q3 = (self.quantil(q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        dentro = self.valores[(self.valores >= q1 - 1.5 * iqr) & (self.valores <= q3 + 1.5 * iqr)]
+        return {'q1': q1, 'med': mediana, 'q3': q3,
+                'whislo': float(dentro.min()), 'whishi': float(dentro.max()), 'fliers': []}
+
+def calcular_bordas_auto(n, minimo, maximo, q25, q75):
+    """
+    Bordas do histograma pela regra 'auto' do numpy a partir de estatísticas já acumuladas
+    """
+    if minimo == maximo:
+        minimo, maximo = minimo - 0.5, maximo + 0.5
+    amplitude = maximo - minimo
+    largura_fd = 2.0 * (q75 - q25) * n ** (-1.0 / 3.0)
+    largura_sturges = amplitude / (np.log2(n) + 1.0)
+    largura_raiz = amplitude / np.sqrt(n)
+    largura = min(max(largura_fd, largura_raiz / 2), largura_sturges)
+    n_bins = int(np.ceil(amplitude / largura)) if largura else 1
+    return np.linspace(minimo, maximo, n_bins + 1)
+
+class AcumuladorHistograma:
+    """
+    Contagens do histograma e soma dos núcleos da KDE de uma coluna, com bordas,
+    grade e largura de banda definidas a partir de uma passagem anterior
+    """
+    def __init__(self, bordas, grade, largura_banda):
+        self.bordas = np.asarray(bordas)
+        self.grade = np.asarray(grade)
+        self.largura_banda = largura_banda
+        self.n = 0
+        self.contagens = np.zeros(len(self.bordas) - 1, dtype=np.int64)
+        self.nucleos = np.zeros(len(self.grade))
+
+    @classmethod
+    def a_partir_de(cls, n, minimo, maximo, desvio, q25, q75, pontos_kde=PONTOS_KDE):
+        """
+        Cria o acumulador com os mesmos padrões de calcular_distribuicao (bins 'auto', regra de Scott)
+        """
+        bordas = calcular_bordas_auto(n, minimo, maximo, q25, q75)
+        return cls(bordas, np.linspace(minimo, maximo, pontos_kde), desvio * n ** (-1 / 5))
+
+    def atualizar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        self.n += len(valores)
+        self.contagens += np.histogram(valores, bins=self.bordas)[0]
+        for inicio in range(0, len(valores), 10000):
+            z = (self.grade[:, None] - valores[None, inicio:inicio + 10000]) / self.largura_banda
+            self.nucleos += np.exp(-0.5 * z ** 2).sum(axis=1)
+
+    def combinar(self, outro):
+        self.n += outro.n
+        self.contagens += outro.contagens
+        self.nucleos += outro.nucleos
+
+    def distribuicao(self):
+        """
+        Distribuição no mesmo formato de populacao.calcular_distribuicao
+        """
+        densidade = self.nucleos / (self.n * self.largura_banda * np.sqrt(2 * np.pi))
+        curva = densidade * (self.contagens * np.diff(self.bordas)).sum()
+        return {
+            'bordas': [round(float(v), 6) for v in self.bordas],
+            'contagens': [int(v) for v in self.contagens],
+            'kde_x': [round(float(v), 6) for v in self.grade],
+            'kde_y': [round(float(v), 6) for v in curva]
+        }
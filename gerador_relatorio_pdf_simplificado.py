@@ -1,165 +1,393 @@
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from fpdf import FPDF
-import json
 import os
 from datetime import datetime
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import io
+import zlib
+from collections import OrderedDict
+from functools import cached_property
+from populacao import obter_contexto
+# Funções de escore reexportadas para manter a interface deste módulo
+from risco_cardiaco import calcular_risco_simplificado, categorizar_risco, calcular_risco_lote
 
-# Configurações de estilo para os gráficos
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette('viridis')
+# Formas de desenhar os gráficos: primitivas vetoriais do FPDF ou imagens do matplotlib
+BACKENDS_GRAFICOS = ('vetorial', 'matplotlib')
 
-# Carregar o dataset para estatísticas da população e as referências
-df_pop = pd.read_csv('framingham_clean.csv')
+# Imagens dos gráficos do matplotlib no PDF: largura na página (mm), codificações
+# aceitas e opções padrão. dpi é a resolução na página (None: figura a 100 dpi, cerca
+# de 160 dpi na página); 'rgb' é sem perdas, 'paleta' reduz a imagem a até 256 cores
+# e 'jpeg' usa a qualidade informada. compressao é o nível do zlib (0 a 9).
+LARGURA_GRAFICOS_MM = 160
+CODIFICACOES_IMAGEM = ('rgb', 'paleta', 'jpeg')
+OPCOES_IMAGEM = {'dpi': None, 'codificacao': 'rgb', 'compressao': 6, 'qualidade': 85}
 
-# Carregar estatísticas e referências
-with open('estatisticas.json', 'r') as f:
-    estatisticas = json.load(f)
+# Perfis de relatório: páginas geradas, na ordem. A triagem omite as visualizações
+# (radar e histogramas comparativos) e não usa gráficos nem o grupo de comparação.
+PERFIS_RELATORIO = {
+    'completo': ['resumo', 'detalhes', 'visualizacoes', 'recomendacoes'],
+    'triagem': ['resumo', 'detalhes', 'recomendacoes']
+}
 
-# Função para calcular o escore de risco sem modelo preditivo
-def calcular_risco_simplificado(dados):
-    """
-    Calcula um escore de risco simples baseado em valores de referência
-    """
-    referencias = estatisticas['referencias']
-    pontos = 0
-    
-    # Atribuir pontos para cada fator de risco
-    for fator, ref in referencias.items():
-        if fator in dados:
-            valor = dados[fator]
-            if valor >= ref['alto']:
-                pontos += 2
-            elif valor >= ref['moderado']:
-                pontos += 1
-                
-    # Fatores binários
-    fatores_binarios = ['currentSmoker', 'prevalentHyp', 'prevalentStroke', 'diabetes']
-    for fator in fatores_binarios:
-        if fator in dados and dados[fator] == 1:
-            pontos += 2
-            
-    # Calcular probabilidade normalizada (0 a 1)
-    # Considerando pontuação máxima possível = 16 (8 fatores contínuos + 4 binários)
-    max_pontos = 16
-    probabilidade = pontos / max_pontos
-    
-    return probabilidade
+# Fatores e rótulos do gráfico de radar
+FATORES_RADAR = ['age', 'sysBP', 'BMI', 'glucose', 'totChol']
+ROTULOS_RADAR = ['Idade', 'Pressão Sistólica', 'IMC', 'Glicose', 'Colesterol Total']
+
+# O matplotlib só é importado (e o estilo aplicado) quando o primeiro gráfico é criado
+_pyplot = None
 
-# Função para categorizar o risco
-def categorizar_risco(probabilidade):
+def obter_pyplot():
     """
-    Categoriza o risco cardíaco com base na probabilidade
+    Importa o matplotlib sob demanda e aplica as configurações de estilo uma única vez
     """
-    if probabilidade < 0.25:
-        return "Baixo", "green"
-    elif probabilidade < 0.50:
-        return "Moderado", "orange"
-    else:
-        return "Alto", "red"
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib.pyplot as plt
+        
+        # Configurações de estilo para os gráficos
+        plt.style.use('seaborn-v0_8-whitegrid')
+        _pyplot = plt
+    return _pyplot
 
 # Função para gerar o nome do arquivo
 def gerar_nome_arquivo(nome_paciente):
     """
     Gera um nome de arquivo baseado no nome do paciente e data atual
     """
-    data_atual = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Microssegundos evitam que pacientes com o mesmo nome no mesmo segundo se sobrescrevam
+    data_atual = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     nome_sem_espacos = nome_paciente.replace(" ", "_")
     return f"Relatorio_Risco_Cardiaco_{nome_sem_espacos}_{data_atual}.pdf"
 
-# Função para criar gráfico comparativo
-def criar_grafico_comparativo(valor_paciente, coluna, titulo, nome_temp):
+def validar_opcoes_imagem(opcoes=None):
     """
-    Cria um gráfico comparando o valor do paciente com a distribuição populacional
+    Completa as opções das imagens com os valores padrão e gera ValueError se alguma for inválida
+    """
+    opcoes = dict(OPCOES_IMAGEM, **(opcoes or {}))
+    desconhecidas = set(opcoes) - set(OPCOES_IMAGEM)
+    if desconhecidas:
+        raise ValueError(f"Opções de imagem desconhecidas: {', '.join(sorted(desconhecidas))}")
+    if opcoes['codificacao'] not in CODIFICACOES_IMAGEM:
+        raise ValueError(f"Codificação de imagem inválida: '{opcoes['codificacao']}' "
+                         f"(opções: {', '.join(CODIFICACOES_IMAGEM)})")
+    if opcoes['dpi'] is not None and opcoes['dpi'] <= 0:
+        raise ValueError('A resolução das imagens deve ser maior que 0')
+    if not 0 <= opcoes['compressao'] <= 9:
+        raise ValueError('O nível de compressão deve estar entre 0 e 9')
+    if not 1 <= opcoes['qualidade'] <= 95:
+        raise ValueError('A qualidade JPEG deve estar entre 1 e 95')
+    return opcoes
+
+def dpi_figura(largura_polegadas, dpi_pagina=None):
+    """
+    Resolução de uma figura para que, colocada com LARGURA_GRAFICOS_MM na página,
+    tenha dpi_pagina pontos por polegada (None: resolução padrão da figura)
+    """
+    if dpi_pagina is None:
+        return None
+    return dpi_pagina * LARGURA_GRAFICOS_MM / 25.4 / largura_polegadas
+
+# Função para rasterizar uma figura em memória
+def renderizar_figura(fig, opcoes=None):
+    """
+    Rasteriza uma figura do matplotlib em memória e devolve a imagem no formato
+    interno de imagens do FPDF, sem arquivos temporários
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    
+    canvas = FigureCanvas(fig)
+    canvas.draw()
+    return imagem_do_canvas(canvas, opcoes)
+
+def imagem_do_canvas(canvas, opcoes=None):
+    """
+    Converte os pixels já desenhados de um canvas Agg no formato de imagens do FPDF
+    """
+    # Descartar o canal alfa: o fundo das figuras é opaco
+    return codificar_imagem(np.ascontiguousarray(np.asarray(canvas.buffer_rgba())[:, :, :3]), opcoes)
+
+def codificar_imagem(pixels, opcoes=None):
+    """
+    Codifica pixels RGB (altura x largura x 3) no formato de imagens do FPDF:
+    RGB comprimido sem perdas, paleta de até 256 cores comprimida ou JPEG
+    """
+    opcoes = dict(OPCOES_IMAGEM, **(opcoes or {}))
+    altura, largura = pixels.shape[:2]
+    imagem = {'w': largura, 'h': altura, 'bpc': 8}
+    
+    if opcoes['codificacao'] == 'rgb':
+        return dict(imagem, cs='DeviceRGB', f='FlateDecode', data=zlib.compress(pixels.tobytes(), opcoes['compressao']))
+        
+    # O Pillow é instalado como dependência do matplotlib
+    from PIL import Image
+    
+    if opcoes['codificacao'] == 'jpeg':
+        saida = io.BytesIO()
+        Image.fromarray(pixels).save(saida, format='JPEG', quality=opcoes['qualidade'])
+        return dict(imagem, cs='DeviceRGB', f='DCTDecode', data=saida.getvalue())
+        
+    # Gráficos têm poucas cores além das bordas suavizadas: a paleta reduz a imagem
+    # a um byte por pixel, com perda imperceptível
+    indexada = Image.fromarray(pixels).quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    indices = np.asarray(indexada)
+    paleta = bytes(indexada.getpalette()[:3 * (int(indices.max()) + 1)])
+    return dict(imagem, cs='Indexed', pal=paleta, f='FlateDecode',
+                data=zlib.compress(indices.tobytes(), opcoes['compressao']))
+
+# Fundos dos gráficos já desenhados neste processo (chave -> FundoGrafico), do menos
+# ao mais usado recentemente. Cada fundo ocupa alguns MB (pixels RGBA da figura).
+MAXIMO_FUNDOS = 40
+_fundos = OrderedDict()
+
+class FundoGrafico:
     """
-    plt.figure(figsize=(10, 6))
-    # Plotar histograma da população
-    sns.histplot(df_pop[coluna], kde=True, color='skyblue')
+    Figura do matplotlib cuja parte comum a todos os pacientes (eixos, rótulos,
+    distribuição da população) é desenhada uma única vez e guardada. Os elementos
+    do paciente são marcados como animados: a cada paciente a imagem guardada é
+    restaurada e apenas eles são desenhados por cima.
+    """
+    def __init__(self, fig, ax, elementos, origem):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+        
+        self.fig = fig
+        self.ax = ax
+        self.elementos = elementos
+        # Mantém vivo o objeto de origem, cujo id faz parte da chave do fundo
+        self.origem = origem
+        for elemento in elementos.values():
+            elemento.set_animated(True)
+        self.canvas = FigureCanvas(fig)
+        self.canvas.draw()
+        self.fundo = self.canvas.copy_from_bbox(fig.bbox)
+        
+    def renderizar(self, opcoes=None):
+        """
+        Restaura o fundo, desenha os elementos do paciente e devolve a imagem
+        """
+        self.canvas.restore_region(self.fundo)
+        for elemento in self.elementos.values():
+            self.ax.draw_artist(elemento)
+        return imagem_do_canvas(self.canvas, opcoes)
+
+def obter_fundo(chave, montar):
+    """
+    Devolve o fundo da chave, montando-o na primeira vez (montar() -> FundoGrafico)
+    """
+    fundo = _fundos.pop(chave, None)
+    if fundo is None:
+        fundo = montar()
+    _fundos[chave] = fundo
+    if len(_fundos) > MAXIMO_FUNDOS:
+        _fundos.popitem(last=False)
+    return fundo
+
+# Margens do gráfico comparativo (frações da figura), com espaço para o título
+# e para rótulos de contagem de até quatro dígitos
+MARGENS_COMPARATIVO = {'left': 0.08, 'right': 0.98, 'bottom': 0.09, 'top': 0.93}
+
+def montar_grafico_comparativo(coluna, distribuicao, valor_paciente=None, titulo='', dpi=None):
+    """
+    Monta a figura do gráfico comparativo. Sem valor_paciente, a linha e o texto
+    do paciente ficam sobre a primeira borda do histograma, sem alterar os limites
+    dos eixos, para serem reposicionados a cada paciente. dpi é a resolução na página.
+    """
+    from matplotlib.colors import to_rgba
+    from matplotlib.figure import Figure
     
-    # Adicionar linha vertical para o valor do paciente
-    plt.axvline(x=valor_paciente, color='red', linestyle='--', linewidth=2)
+    obter_pyplot()
+    bordas = np.asarray(distribuicao['bordas'])
     
-    # Adicionar texto para o valor do paciente
-    plt.text(valor_paciente, plt.ylim()[1]*0.9, f'Paciente: {valor_paciente}', 
-             ha='center', va='center', bbox=dict(facecolor='white', alpha=0.7))
+    fig = Figure(figsize=(10, 6), dpi=dpi_figura(10, dpi))
+    ax = fig.add_subplot(111)
+    # Plotar histograma e KDE pré-calculados da população
+    ax.bar(bordas[:-1], distribuicao['contagens'], width=np.diff(bordas), align='edge',
+           color=to_rgba('skyblue', 0.5), edgecolor='black', linewidth=0.8)
+    ax.plot(distribuicao['kde_x'], distribuicao['kde_y'], color='skyblue')
+    ax.set_xlabel(coluna)
+    ax.set_ylabel('Count')
     
-    plt.title(titulo)
-    plt.tight_layout()
+    # Adicionar linha vertical e texto para o valor do paciente (a linha fica acima
+    # das bordas dos eixos, como quando é desenhada por cima do fundo guardado)
+    x = bordas[0] if valor_paciente is None else valor_paciente
+    linha = ax.axvline(x=x, color='red', linestyle='--', linewidth=2, zorder=2.6)
+    texto = ax.text(x, ax.get_ylim()[1]*0.9, f'Paciente: {valor_paciente}',
+                    ha='center', va='center', bbox=dict(facecolor='white', alpha=0.7))
     
-    # Salvar temporariamente
-    plt.savefig(nome_temp)
-    plt.close()
+    # Margens fixas: o texto do paciente não altera a posição dos eixos, e o gráfico
+    # desenhado sobre o fundo guardado é idêntico ao montado por inteiro
+    ax.set_title(titulo or coluna)
+    fig.subplots_adjust(**MARGENS_COMPARATIVO)
+    return fig, ax, {'linha': linha, 'texto': texto, 'titulo': ax.title}
 
-# Função para criar gráfico de radar
-def criar_grafico_radar(dados_paciente, nome_temp):
+# Função para criar gráfico comparativo
+def criar_grafico_comparativo(valor_paciente, coluna, titulo, distribuicao=None, imagens=None):
+    """
+    Cria um gráfico comparando o valor do paciente com a distribuição populacional
+    (ou com a distribuição informada, ex.: a do estrato do paciente).
+    imagens são as opções de resolução e codificação da imagem (ver OPCOES_IMAGEM).
     """
-    Cria um gráfico de radar com os principais fatores de risco
+    if distribuicao is None:
+        distribuicao = obter_contexto().distribuicoes[coluna]
+    dpi = (imagens or {}).get('dpi')
+    
+    fundo = obter_fundo(('comparativo', coluna, id(distribuicao), dpi),
+                        lambda: FundoGrafico(*montar_grafico_comparativo(coluna, distribuicao, dpi=dpi), distribuicao))
+    minimo, maximo = fundo.ax.get_xlim()
+    if not minimo <= valor_paciente <= maximo:
+        # Valor fora dos eixos do fundo: a figura é montada por inteiro, ampliando os limites
+        fig, _, _ = montar_grafico_comparativo(coluna, distribuicao, valor_paciente, titulo, dpi)
+        return renderizar_figura(fig, imagens)
+    
+    # Reposicionar apenas os elementos do paciente sobre o fundo já desenhado
+    elementos = fundo.elementos
+    elementos['linha'].set_xdata([valor_paciente, valor_paciente])
+    elementos['texto'].set_x(valor_paciente)
+    elementos['texto'].set_text(f'Paciente: {valor_paciente}')
+    elementos['titulo'].set_text(titulo)
+    return fundo.renderizar(imagens)
+
+# Função para normalizar os fatores do gráfico de radar
+def normalizar_radar(dados_paciente, medias=None):
+    """
+    Normaliza os fatores do radar do paciente e as médias da população (ou as
+    médias informadas, ex.: as do estrato do paciente) pelos mínimos e máximos
+    (pré-calculados) da população
     """
-    # Fatores para o gráfico de radar
-    fatores = ['age', 'sysBP', 'BMI', 'glucose', 'totChol']
+    resumo = obter_contexto().resumo
     
-    # Obter médias da população
-    medias_pop = df_pop[fatores].mean()
+    # Obter médias da população (pré-calculadas)
+    medias_pop = resumo['medias'] if medias is None else medias
     
     # Normalizar os dados para comparação
-    max_vals = df_pop[fatores].max()
-    min_vals = df_pop[fatores].min()
+    max_vals = resumo['maximos']
+    min_vals = resumo['minimos']
     
     # Normalização dos dados do paciente
-    paciente_norm = [(dados_paciente[f] - min_vals[f]) / (max_vals[f] - min_vals[f]) for f in fatores]
+    paciente_norm = [(dados_paciente[f] - min_vals[f]) / (max_vals[f] - min_vals[f]) for f in FATORES_RADAR]
     
     # Normalização das médias da população
-    pop_norm = [(medias_pop[f] - min_vals[f]) / (max_vals[f] - min_vals[f]) for f in fatores]
+    pop_norm = [(medias_pop[f] - min_vals[f]) / (max_vals[f] - min_vals[f]) for f in FATORES_RADAR]
+    
+    return paciente_norm, pop_norm
+
+# Função para calcular as marcas de um eixo
+def calcular_marcas(minimo, maximo, quantidade=5):
+    """
+    Calcula marcas arredondadas (múltiplos de 1, 2 ou 5) para um eixo de gráfico
+    """
+    amplitude = maximo - minimo
+    if amplitude <= 0:
+        return [minimo]
+    
+    magnitude = 10 ** np.floor(np.log10(amplitude / quantidade))
+    for fator in (1, 2, 5, 10):
+        passo = fator * magnitude
+        if amplitude / passo <= quantidade:
+            break
+    
+    inicio = np.ceil(minimo / passo) * passo
+    return [float(marca) for marca in np.arange(inicio, maximo + passo * 1e-9, passo)]
+
+def montar_grafico_radar(pop_norm, rotulo_medias, limite, paciente_norm=None, dpi=None):
+    """
+    Monta a figura do gráfico de radar com o eixo radial de 0 (ou do menor valor,
+    se negativo) até limite. Sem paciente_norm, o polígono do paciente é criado
+    sobre o das médias, para ser atualizado a cada paciente. dpi é a resolução na página.
+    """
+    from matplotlib.figure import Figure
+    
+    obter_pyplot()
+    fatores = FATORES_RADAR
     
     # Criar figura para o gráfico de radar
-    fig = plt.figure(figsize=(10, 8))
+    fig = Figure(figsize=(10, 8), dpi=dpi_figura(10, dpi))
     ax = fig.add_subplot(111, polar=True)
     
     # Ângulos para cada eixo
     angles = np.linspace(0, 2*np.pi, len(fatores), endpoint=False).tolist()
     
     # Completar o círculo repetindo o primeiro valor
-    paciente_norm.append(paciente_norm[0])
-    pop_norm.append(pop_norm[0])
+    pop_norm = list(pop_norm) + [pop_norm[0]]
+    paciente_norm = pop_norm if paciente_norm is None else list(paciente_norm) + [paciente_norm[0]]
     angles.append(angles[0])
     
-    # Adicionar rótulos legíveis
-    rotulos = ['Idade', 'Pressão Sistólica', 'IMC', 'Glicose', 'Colesterol Total']
-    rotulos.append(rotulos[0])
-    
-    # Plotar dados do paciente
-    ax.plot(angles, paciente_norm, 'r-', linewidth=2, label='Paciente')
-    ax.fill(angles, paciente_norm, 'r', alpha=0.1)
+    # Plotar dados do paciente acima dos demais elementos (inclusive da legenda), na
+    # mesma ordem em que são desenhados por cima do fundo guardado
+    linha, = ax.plot(angles, paciente_norm, 'r-', linewidth=2, label='Paciente', zorder=7)
+    area, = ax.fill(angles, paciente_norm, 'r', alpha=0.1, zorder=6)
     
     # Plotar médias da população
-    ax.plot(angles, pop_norm, 'b-', linewidth=2, label='Média Pop.')
+    ax.plot(angles, pop_norm, 'b-', linewidth=2, label=rotulo_medias)
     ax.fill(angles, pop_norm, 'b', alpha=0.1)
+    ax.set_ylim(min(0, *paciente_norm), limite)
     
     # Adicionar rótulos aos eixos
-    plt.xticks(angles[:-1], rotulos[:-1])
+    ax.set_xticks(angles[:-1], ROTULOS_RADAR)
     
     # Adicionar título e legenda
-    plt.title('Comparação dos Fatores de Risco', size=15)
-    plt.legend(loc='upper right')
+    ax.set_title('Comparação dos Fatores de Risco', size=15)
+    ax.legend(loc='upper right')
+    return fig, ax, {'area': area, 'linha': linha}
+
+# Função para criar gráfico de radar
+def criar_grafico_radar(dados_paciente, medias=None, rotulo_medias='Média Pop.', imagens=None):
+    """
+    Cria um gráfico de radar com os principais fatores de risco.
+    imagens são as opções de resolução e codificação da imagem (ver OPCOES_IMAGEM).
+    """
+    if medias is None:
+        medias = obter_contexto().resumo['medias']
+    paciente_norm, pop_norm = normalizar_radar(dados_paciente, medias)
+    
+    # Eixo radial até o maior valor arredondado para cima em passos de 0,1: poucos
+    # fundos diferentes por grupo, mantendo o gráfico ampliado como na escala automática
+    limite = max(0.1, np.ceil(max(paciente_norm + pop_norm) * 10 - 1e-9) / 10)
+    dpi = (imagens or {}).get('dpi')
+    if min(paciente_norm) < 0:
+        # Paciente abaixo do mínimo da população: a figura é montada por inteiro
+        fig, _, _ = montar_grafico_radar(pop_norm, rotulo_medias, limite, paciente_norm, dpi)
+        return renderizar_figura(fig, imagens)
+    
+    fundo = obter_fundo(('radar', id(medias), rotulo_medias, limite, dpi),
+                        lambda: FundoGrafico(*montar_grafico_radar(pop_norm, rotulo_medias, limite, dpi=dpi), medias))
     
-    # Salvar temporariamente
-    plt.savefig(nome_temp)
-    plt.close()
+    # Atualizar apenas o polígono do paciente sobre o fundo já desenhado
+    angles = fundo.elementos['linha'].get_xdata()
+    paciente_norm = paciente_norm + [paciente_norm[0]]
+    fundo.elementos['linha'].set_ydata(paciente_norm)
+    fundo.elementos['area'].set_xy(np.column_stack([angles, paciente_norm]))
+    return fundo.renderizar(imagens)
 
 # Classe para criar o relatório PDF
 class RelatorioRiscoCardiaco(FPDF):
-    def __init__(self, nome_paciente, dados_paciente):
+    def __init__(self, nome_paciente, dados_paciente, graficos='vetorial', cache=None, perfil='completo',
+                 imagens=None):
+        if graficos not in BACKENDS_GRAFICOS:
+            raise ValueError(f"Tipo de gráficos inválido: '{graficos}' (opções: {', '.join(BACKENDS_GRAFICOS)})")
+        if perfil not in PERFIS_RELATORIO:
+            raise ValueError(f"Perfil de relatório inválido: '{perfil}' (opções: {', '.join(PERFIS_RELATORIO)})")
         super().__init__()
         self.nome_paciente = nome_paciente
         self.dados_paciente = dados_paciente
+        self.graficos = graficos
+        self.cache = cache
+        self.perfil = perfil
+        # Resolução e codificação das imagens do matplotlib (ver OPCOES_IMAGEM)
+        self.imagens = validar_opcoes_imagem(imagens)
+        # Data de emissão impressa no resumo: a da geração do PDF (um relatório reaproveitado
+        # do cache mantém a data em que foi gerado)
+        self.data_emissao = datetime.now().strftime("%d/%m/%Y")
         self.set_auto_page_break(auto=True, margin=15)
         self.probabilidade_risco = calcular_risco_simplificado(dados_paciente)
         self.categoria_risco, self.cor_risco = categorizar_risco(self.probabilidade_risco)
         
+    @cached_property
+    def grupo(self):
+        """
+        Estrato de sexo e década de idade do paciente (ou a população inteira),
+        calculado apenas pelos perfis que desenham as visualizações
+        """
+        return obter_contexto().grupo_comparacao(self.dados_paciente)
+        
     def header(self):
         # Logo (pode ser substituído por uma imagem real)
         self.set_font('Arial', 'B', 15)
@@ -180,7 +408,7 @@ class RelatorioRiscoCardiaco(FPDF):
         
         # Data do relatório
         self.set_font('Arial', '', 10)
-        self.cell(0, 10, f'Data: {datetime.now().strftime("%d/%m/%Y")}', 0, 1, 'L')
+        self.cell(0, 10, f'Data: {self.data_emissao}', 0, 1, 'L')
         
         # Probabilidade e categoria de risco
         self.ln(10)
@@ -230,9 +458,10 @@ class RelatorioRiscoCardiaco(FPDF):
         
         # Tabela de fatores
         self.set_font('Arial', 'B', 10)
-        self.cell(80, 7, 'Fator', 1, 0, 'C')
-        self.cell(30, 7, 'Valor', 1, 0, 'C')
-        self.cell(40, 7, 'Média População', 1, 0, 'C')
+        self.cell(60, 7, 'Fator', 1, 0, 'C')
+        self.cell(25, 7, 'Valor', 1, 0, 'C')
+        self.cell(35, 7, 'Média População', 1, 0, 'C')
+        self.cell(30, 7, 'Percentil', 1, 0, 'C')
         self.cell(40, 7, 'Referência', 1, 1, 'C')
         
         # Configurações para comparação com valores de referência
@@ -271,10 +500,11 @@ class RelatorioRiscoCardiaco(FPDF):
         for fator in ['age', 'sysBP', 'diaBP', 'BMI', 'glucose', 'totChol', 'heartRate']:
             if fator in self.dados_paciente:
                 valor = self.dados_paciente[fator]
-                media_pop = df_pop[fator].mean()
+                media_pop = obter_contexto().resumo['medias'][fator]
+                percentil = obter_contexto().percentil(fator, valor)
                 
                 # Colorir célula se valor estiver fora da referência
-                self.cell(80, 7, nomes_legiveis.get(fator, fator), 1, 0, 'L')
+                self.cell(60, 7, nomes_legiveis.get(fator, fator), 1, 0, 'L')
                 
                 # Verificar se valor está fora da referência
                 cor_original = self.text_color
@@ -284,10 +514,11 @@ class RelatorioRiscoCardiaco(FPDF):
                 elif 'baixo' in referencias[fator] and valor < referencias[fator]['baixo']:
                     self.set_text_color(255, 0, 0)  # Vermelho para valor baixo
                 
-                self.cell(30, 7, f'{valor:.1f}', 1, 0, 'C')
+                self.cell(25, 7, f'{valor:.1f}', 1, 0, 'C')
                 self.set_text_color(0, 0, 0)
                 
-                self.cell(40, 7, f'{media_pop:.1f}', 1, 0, 'C')
+                self.cell(35, 7, f'{media_pop:.1f}', 1, 0, 'C')
+                self.cell(30, 7, f'{percentil:.0f}º', 1, 0, 'C')
                 self.cell(40, 7, referencias[fator]['ref'], 1, 1, 'C')
         
         # Fatores categóricos
@@ -336,24 +567,214 @@ class RelatorioRiscoCardiaco(FPDF):
                 # Redefinir para a cor original
                 self.set_text_color(0, 0, 0)  # Redefinir para preto
     
+    def imagem_em_memoria(self, imagem, x=None, y=None, w=0, h=0):
+        """
+        Adiciona ao PDF uma imagem rasterizada em memória (ver renderizar_figura)
+        """
+        # Registrar a imagem diretamente na tabela do FPDF com uma chave única,
+        # para que image() a reutilize sem tentar abrir um arquivo
+        chave = f'memoria_{len(self.images) + 1}'
+        self.images[chave] = dict(imagem, i=len(self.images) + 1)
+        self.image(chave, x=x, y=y, w=w, h=h)
+        
+    def poligono(self, pontos, estilo=''):
+        """
+        Desenha um polígono fechado; estilo como em rect ('' contorno, 'F' preenchido, 'DF' ambos)
+        """
+        operador = {'F': 'f', 'DF': 'b', 'FD': 'b'}.get(estilo, 's')
+        self._caminho(pontos, operador)
+        
+    def polilinha(self, pontos):
+        """
+        Desenha uma linha aberta ligando os pontos em sequência
+        """
+        self._caminho(pontos, 'S')
+        
+    def _caminho(self, pontos, operador):
+        # Mesmo sistema de coordenadas usado por FPDF.rect e FPDF.line
+        comandos = [f'{px * self.k:.2f} {(self.h - py) * self.k:.2f} {"m" if i == 0 else "l"}'
+                    for i, (px, py) in enumerate(pontos)]
+        self._out(' '.join(comandos) + ' ' + operador)
+        
+    def desenhar_radar_vetorial(self, x, y, w, h):
+        """
+        Desenha o gráfico de radar com primitivas vetoriais do FPDF
+        """
+        paciente_norm, pop_norm = normalizar_radar(self.dados_paciente, self.grupo.resumo['medias'])
+        angulos = np.linspace(0, 2*np.pi, len(FATORES_RADAR), endpoint=False)
+        
+        # Título
+        self.set_font('Arial', '', 12)
+        self.set_xy(x, y)
+        self.cell(w, 6, 'Comparação dos Fatores de Risco', 0, 0, 'C')
+        
+        # Centro e raio, deixando margem para os rótulos dos eixos
+        cx = x + w / 2
+        cy = y + 8 + (h - 8) / 2
+        raio = min(w, h - 8) / 2 - 14
+        
+        def ponto(valor, angulo):
+            # Valores fora do intervalo da população ficam no limite do gráfico
+            valor = min(max(valor, 0), 1)
+            return cx + raio * valor * np.cos(angulo), cy - raio * valor * np.sin(angulo)
+        
+        # Grade: círculos concêntricos e eixos
+        self.set_draw_color(220, 220, 220)
+        self.set_line_width(0.2)
+        niveis = (0.2, 0.4, 0.6, 0.8, 1.0)
+        for nivel in niveis:
+            self.ellipse(cx - raio * nivel, cy - raio * nivel, 2 * raio * nivel, 2 * raio * nivel)
+        for angulo in angulos:
+            self.line(cx, cy, *ponto(1, angulo))
+            
+        # Rótulos dos eixos, alinhados conforme o lado do gráfico
+        self.set_font('Arial', '', 9)
+        self.set_text_color(0, 0, 0)
+        for rotulo, angulo in zip(ROTULOS_RADAR, angulos):
+            rx, ry = cx + raio * 1.08 * np.cos(angulo), cy - raio * 1.08 * np.sin(angulo)
+            largura = self.get_string_width(rotulo)
+            if np.cos(angulo) > 0.1:
+                rx_texto = rx
+            elif np.cos(angulo) < -0.1:
+                rx_texto = rx - largura
+            else:
+                rx_texto = rx - largura / 2
+            self.text(rx_texto, ry + 1, rotulo)
+            
+        # Preenchimentos claros e contornos do paciente (vermelho) e da média (azul)
+        pontos_pop = [ponto(v, a) for v, a in zip(pop_norm, angulos)]
+        pontos_paciente = [ponto(v, a) for v, a in zip(paciente_norm, angulos)]
+        self.set_fill_color(255, 230, 230)
+        self.poligono(pontos_paciente, 'F')
+        self.set_fill_color(225, 225, 250)
+        self.poligono(pontos_pop, 'F')
+        
+        # Valores da grade sobre os preenchimentos
+        self.set_font('Arial', '', 7)
+        self.set_text_color(100, 100, 100)
+        for nivel in niveis:
+            self.text(cx + 1, cy - raio * nivel - 0.5, f'{nivel:.1f}')
+        self.set_text_color(0, 0, 0)
+        
+        self.set_line_width(0.6)
+        self.set_draw_color(0, 0, 255)
+        self.poligono(pontos_pop)
+        self.set_draw_color(255, 0, 0)
+        self.poligono(pontos_paciente)
+        
+        # Legenda
+        self.set_font('Arial', '', 8)
+        for i, (texto, cor) in enumerate([('Paciente', (255, 0, 0)), (self.rotulo_medias(), (0, 0, 255))]):
+            ly = y + 12 + i * 5
+            self.set_draw_color(cor[0], cor[1], cor[2])
+            self.line(x + w - 30, ly, x + w - 24, ly)
+            self.text(x + w - 22, ly + 1, texto)
+            
+        self.set_draw_color(0, 0, 0)
+        self.set_line_width(0.2)
+        
+    def desenhar_comparativo_vetorial(self, valor_paciente, coluna, titulo, x, y, w, h):
+        """
+        Desenha com primitivas vetoriais do FPDF o histograma e a curva KDE
+        pré-calculados do grupo de comparação e a linha do valor do paciente
+        """
+        distribuicao = self.grupo.distribuicoes[coluna]
+        bordas = np.asarray(distribuicao['bordas'])
+        contagens = np.asarray(distribuicao['contagens'])
+        kde_y = np.asarray(distribuicao['kde_y'])
+        
+        # Título
+        self.set_font('Arial', '', 10)
+        self.set_text_color(0, 0, 0)
+        self.set_xy(x, y)
+        self.cell(w, 5, titulo, 0, 0, 'C')
+        
+        # Área dos eixos e escalas (incluindo o valor do paciente no eixo x)
+        ax, ay, aw, ah = x + 14, y + 7, w - 18, h - 17
+        x_min, x_max = min(bordas[0], valor_paciente), max(bordas[-1], valor_paciente)
+        y_max = max(contagens.max(), kde_y.max()) * 1.05
+        
+        def px(valor):
+            return ax + (valor - x_min) / (x_max - x_min) * aw
+        
+        def py(valor):
+            return ay + ah - valor / y_max * ah
+        
+        # Grade e marcas dos eixos
+        self.set_font('Arial', '', 7)
+        self.set_draw_color(220, 220, 220)
+        self.set_line_width(0.2)
+        for marca in calcular_marcas(0, y_max):
+            self.line(ax, py(marca), ax + aw, py(marca))
+            texto = f'{marca:g}'
+            self.text(ax - 1.5 - self.get_string_width(texto), py(marca) + 1, texto)
+        for marca in calcular_marcas(x_min, x_max):
+            self.line(px(marca), ay, px(marca), ay + ah)
+            texto = f'{marca:g}'
+            self.text(px(marca) - self.get_string_width(texto) / 2, ay + ah + 3.5, texto)
+        self.rect(ax, ay, aw, ah)
+        
+        # Histograma da população
+        self.set_fill_color(195, 231, 245)
+        self.set_draw_color(0, 0, 0)
+        self.set_line_width(0.1)
+        for esquerda, direita, contagem in zip(bordas[:-1], bordas[1:], contagens):
+            if contagem > 0:
+                self.rect(px(esquerda), py(contagem), px(direita) - px(esquerda), py(0) - py(contagem), 'DF')
+                
+        # Curva KDE
+        self.set_draw_color(135, 206, 235)
+        self.set_line_width(0.4)
+        self.polilinha([(px(a), py(b)) for a, b in zip(distribuicao['kde_x'], kde_y)])
+        
+        # Linha e rótulo do valor do paciente
+        self.set_draw_color(255, 0, 0)
+        self.set_line_width(0.5)
+        self.dashed_line(px(valor_paciente), ay, px(valor_paciente), ay + ah, 2, 1)
+        
+        texto = f'Paciente: {valor_paciente}'
+        largura = self.get_string_width(texto) + 3
+        self.set_fill_color(255, 255, 255)
+        self.set_draw_color(0, 0, 0)
+        self.set_line_width(0.1)
+        self.rect(px(valor_paciente) - largura / 2, py(y_max * 0.9) - 2.5, largura, 5, 'DF')
+        self.text(px(valor_paciente) - largura / 2 + 1.5, py(y_max * 0.9) + 1, texto)
+        
+        # Rótulos dos eixos
+        self.text(ax + aw / 2 - self.get_string_width(coluna) / 2, y + h - 1, coluna)
+        self.rotate(90, x + 3, ay + ah / 2)
+        self.text(x + 3 - self.get_string_width('Count') / 2, ay + ah / 2, 'Count')
+        self.rotate(0)
+        
+        self.set_line_width(0.2)
+        
+    def rotulo_medias(self):
+        """
+        Legenda das médias do grupo de comparação nos gráficos de radar
+        """
+        return 'Média Pop.' if self.grupo.rotulo is None else 'Média do Grupo'
+        
     def gerar_pagina_visualizacoes(self):
         self.add_page()
         self.set_font('Arial', 'B', 16)
         self.cell(0, 10, 'Visualizações Comparativas', 0, 1, 'L')
         self.ln(5)
         
-        # Criar gráfico de radar
-        temp_radar = 'temp_radar.png'
-        criar_grafico_radar(self.dados_paciente, temp_radar)
-        
-        # Adicionar gráfico de radar ao PDF
-        self.image(temp_radar, x=25, y=30, w=160)
-        os.remove(temp_radar)  # Remover arquivo temporário
+        # Criar gráfico de radar e adicioná-lo ao PDF
+        if self.graficos == 'vetorial':
+            self.desenhar_radar_vetorial(25, 40, 160, 128)
+        else:
+            radar = criar_grafico_radar(self.dados_paciente, self.grupo.resumo['medias'], self.rotulo_medias(),
+                                        self.imagens)
+            self.imagem_em_memoria(radar, x=25, y=30, w=LARGURA_GRAFICOS_MM)
         
         # Adicionar segunda página de visualizações com comparativos individuais
         self.add_page()
         self.set_font('Arial', 'B', 16)
-        self.cell(0, 10, 'Comparações com a População', 0, 1, 'L')
+        if self.grupo.rotulo is None:
+            self.cell(0, 10, 'Comparações com a População', 0, 1, 'L')
+        else:
+            self.cell(0, 10, f'Comparações com {self.grupo.rotulo} (n = {self.grupo.n})', 0, 1, 'L')
         self.ln(5)
         
         # Criar gráficos comparativos para principais fatores
@@ -365,15 +786,20 @@ class RelatorioRiscoCardiaco(FPDF):
         
         y_pos = 30
         for i, (fator, titulo) in enumerate(fatores_comparar):
-            temp_grafico = f'temp_comparativo_{i}.png'
-            criar_grafico_comparativo(self.dados_paciente[fator], fator, titulo, temp_grafico)
+            percentil = self.grupo.percentil(fator, self.dados_paciente[fator])
+            titulo = f"{titulo} (percentil {percentil:.0f} {'na população' if self.grupo.rotulo is None else 'no grupo'})"
+            if self.graficos == 'vetorial':
+                # Gráficos vetoriais começam abaixo do título da página
+                self.desenhar_comparativo_vetorial(self.dados_paciente[fator], fator, titulo, 25, y_pos + 10, 160, 78)
+                y_pos += 82
+                continue
+                
+            grafico = criar_grafico_comparativo(self.dados_paciente[fator], fator, titulo,
+                                                self.grupo.distribuicoes[fator], self.imagens)
             
             # Adicionar gráfico ao PDF
-            self.image(temp_grafico, x=25, y=y_pos, w=160)
+            self.imagem_em_memoria(grafico, x=25, y=y_pos, w=LARGURA_GRAFICOS_MM)
             y_pos += 85  # Espaçamento entre gráficos
-            
-            # Remover arquivo temporário
-            os.remove(temp_grafico)
         
     def gerar_pagina_recomendacoes(self):
         self.add_page()
@@ -460,17 +886,57 @@ class RelatorioRiscoCardiaco(FPDF):
             "avaliação completa e recomendações personalizadas."
         )
         
+    def parametros_cache(self):
+        """
+        Opções que alteram o conteúdo do PDF e por isso fazem parte da chave do cache
+        """
+        parametros = {'graficos': self.graficos, 'perfil': self.perfil}
+        if self.graficos == 'matplotlib':
+            parametros['imagens'] = self.imagens
+        return parametros
+
+    def gerar_paginas(self):
+        """
+        Desenha as páginas do perfil do relatório
+        """
+        for pagina in PERFIS_RELATORIO[self.perfil]:
+            getattr(self, f'gerar_pagina_{pagina}')()
+        
+    def gerar_pdf(self):
+        """
+        Gera o relatório (ou o lê do cache, se houver) e devolve o conteúdo do PDF
+        em bytes, sem gravar arquivo
+        """
+        if self.cache is not None:
+            chave = self.cache.chave(self.nome_paciente, self.dados_paciente, self.parametros_cache())
+            pdf = self.cache.ler(chave)
+            if pdf is not None:
+                return pdf
+                
+        self.gerar_paginas()
+        # O FPDF monta o documento como texto latin-1
+        pdf = self.output(dest='S').encode('latin-1')
+        if self.cache is not None:
+            self.cache.guardar_pdf(chave, pdf)
+        return pdf
+        
     def gerar_relatorio(self):
         """
-        Gera o relatório PDF completo
+        Gera o relatório PDF completo (ou reaproveita o do cache, se houver)
         """
-        self.gerar_pagina_resumo()
-        self.gerar_pagina_detalhes()
-        self.gerar_pagina_visualizacoes()
-        self.gerar_pagina_recomendacoes()
+        nome_arquivo = gerar_nome_arquivo(self.nome_paciente)
+        if self.cache is not None:
+            chave = self.cache.chave(self.nome_paciente, self.dados_paciente, self.parametros_cache())
+            reaproveitado = self.cache.obter(chave, nome_arquivo)
+            if reaproveitado is not None:
+                print(f"Relatório reaproveitado do cache: {reaproveitado}")
+                return reaproveitado
+
+        self.gerar_paginas()
         
         # Salvar o PDF
-        nome_arquivo = gerar_nome_arquivo(self.nome_paciente)
         self.output(nome_arquivo)
+        if self.cache is not None:
+            self.cache.guardar(chave, nome_arquivo)
         print(f"Relatório gerado com sucesso: {nome_arquivo}")
         return nome_arquivo
\ No newline at end of file
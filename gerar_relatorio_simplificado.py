@@ -1,9 +1,13 @@
-import pandas as pd
 import argparse
 import os
 import sys
 import json
-from gerador_relatorio_pdf_simplificado import RelatorioRiscoCardiaco
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pacote_relatorios import FORMATOS_PACOTE, formato_pacote
+
+# pandas, matplotlib e fpdf são importados apenas pelos modos que os utilizam,
+# para que --help, erros de argumentos e o modo de escores iniciem rapidamente
 
 def verificar_arquivos_necessarios():
     """
@@ -18,62 +22,422 @@ def verificar_arquivos_necessarios():
         return False
     return True
 
-def gerar_relatorio_individual(nome_paciente, dados_paciente):
+def imprimir_resultado(nome_paciente, nome_arquivo, probabilidade_risco, categoria_risco):
+    """
+    Exibe o resultado da geração de um relatório
+    """
+    print(f"\nRelatório para {nome_paciente} gerado com sucesso!")
+    print(f"Arquivo: {nome_arquivo}")
+    print(f"Índice de risco cardiovascular: {probabilidade_risco:.0%} (Categoria: {categoria_risco})")
+
+def gerar_relatorio_individual(nome_paciente, dados_paciente, opcoes=None):
     """
-    Gera um relatório para um paciente individual com os dados fornecidos
+    Gera um relatório para um paciente individual com os dados fornecidos.
+    opcoes são repassadas a RelatorioRiscoCardiaco (ex.: {'graficos': 'matplotlib'}).
     """
+    from gerador_relatorio_pdf_simplificado import RelatorioRiscoCardiaco
+    
     # Criar e gerar relatório
-    relatorio = RelatorioRiscoCardiaco(nome_paciente, dados_paciente)
+    relatorio = RelatorioRiscoCardiaco(nome_paciente, dados_paciente, **(opcoes or {}))
     nome_arquivo = relatorio.gerar_relatorio()
     
-    print(f"\nRelatório para {nome_paciente} gerado com sucesso!")
-    print(f"Arquivo: {nome_arquivo}")
-    print(f"Índice de risco cardiovascular: {relatorio.probabilidade_risco:.0%} (Categoria: {relatorio.categoria_risco})")
+    imprimir_resultado(nome_paciente, nome_arquivo, relatorio.probabilidade_risco, relatorio.categoria_risco)
     
     return nome_arquivo
 
-def processar_arquivo_csv(arquivo_csv, coluna_nome=None):
+def _inicializar_worker(metricas=None, pyplot=True):
     """
-    Processa um arquivo CSV com dados de múltiplos pacientes
+    Inicializa um processo do pool carregando os dados da população uma única vez.
+    metricas é a configuração do coletor de métricas do processo principal, se ativo;
+    pyplot indica se o lote pode desenhar gráficos com o matplotlib.
+    """
+    import gerador_relatorio_pdf_simplificado as gerador
+    from populacao import obter_contexto
+    
+    obter_contexto().carregar()
+    if pyplot:
+        gerador.obter_pyplot()
+    if metricas:
+        from metricas_relatorios import ativar_metricas
+        ativar_metricas(**metricas)
+
+def _gerar_relatorio_tarefa(tarefa, em_memoria=False):
     """
+    Gera o relatório de uma tarefa do lote dentro de um processo do pool.
+    Com em_memoria, devolve o conteúdo do PDF (bytes) no lugar do nome do arquivo,
+    sem gravar nada em disco.
+    Erros são capturados e devolvidos para não interromper o restante do lote.
+    """
+    from gerador_relatorio_pdf_simplificado import RelatorioRiscoCardiaco
+    
+    nome, dados, opcoes = tarefa
     try:
-        # Carregar o arquivo CSV
-        df = pd.read_csv(arquivo_csv)
+        relatorio = RelatorioRiscoCardiaco(nome, dados, **opcoes)
+        saida = relatorio.gerar_pdf() if em_memoria else relatorio.gerar_relatorio()
+        return nome, saida, relatorio.probabilidade_risco, relatorio.categoria_risco, None
+    except Exception as e:
+        return nome, None, None, None, str(e)
+
+def gerar_relatorios_lote(tarefas, executor=None, em_memoria=False):
+    """
+    Gera os relatórios das tarefas (nome, dados, opcoes) e devolve os resultados na mesma
+    ordem da entrada, no próprio processo ou distribuídos no pool fornecido
+    """
+    if executor is None:
+        for tarefa in tarefas:
+            yield _gerar_relatorio_tarefa(tarefa, em_memoria)
+        return
         
-        # Verificar se a coluna de nome existe
-        if coluna_nome and coluna_nome not in df.columns:
-            print(f"Erro: Coluna '{coluna_nome}' não encontrada no arquivo.")
+    futuros = [executor.submit(_gerar_relatorio_tarefa, tarefa, em_memoria) for tarefa in tarefas]
+    for i, (nome, _, _) in enumerate(tarefas):
+        # Liberar cada resultado (que pode conter o PDF) assim que for consumido
+        futuro, futuros[i] = futuros[i], None
+        try:
+            yield futuro.result()
+        except Exception as e:
+            # Falha do próprio processo (ex.: worker encerrado) afeta apenas este paciente
+            yield nome, None, None, None, str(e)
+
+def montar_tarefas(df, coluna_nome=None, opcoes=None, coluna_perfil=None):
+    """
+    Monta as tarefas (nome, dados, opcoes) de um bloco do arquivo, na ordem das linhas.
+    Com coluna_perfil, o perfil preenchido em cada linha substitui o perfil de opcoes.
+    """
+    import pandas as pd
+    
+    colunas_extras = [coluna for coluna in (coluna_nome, coluna_perfil) if coluna]
+    tarefas = []
+    for i, row in df.iterrows():
+        # Determinar o nome do paciente
+        if coluna_nome:
+            nome = row[coluna_nome]
+        else:
+            nome = f"Paciente_{i+1}"
+            
+        opcoes_linha = opcoes or {}
+        if coluna_perfil and not pd.isna(row[coluna_perfil]):
+            opcoes_linha = dict(opcoes_linha, perfil=str(row[coluna_perfil]).strip())
+            
+        # Extrair dados relevantes (excluindo as colunas de nome e de perfil se existirem)
+        dados = row.drop(colunas_extras) if colunas_extras else row
+        tarefas.append((nome, dados, opcoes_linha))
+    return tarefas
+
+def validar_bloco(df, coluna_nome=None, coluna_perfil=None):
+    """
+    Valida todas as linhas de um bloco com operações vetorizadas, antes de gerar
+    qualquer gráfico: linhas inválidas são rejeitadas sem custo de renderização.
+    Devolve as linhas válidas (com os valores convertidos para número), seus dados
+    sem as colunas de nome e de perfil, o motivo de rejeição de cada linha do bloco
+    ('' nas válidas) e a máscara das linhas rejeitadas.
+    """
+    from gerador_relatorio_pdf_simplificado import PERFIS_RELATORIO
+    from risco_cardiaco import validar_pacientes
+    
+    # Verificar se as colunas de nome e de perfil existem
+    # (o erro interrompe o lote e marca o pacote, se houver, como incompleto)
+    if coluna_nome and coluna_nome not in df.columns:
+        raise ValueError(f"Coluna '{coluna_nome}' não encontrada no arquivo.")
+    if coluna_perfil and coluna_perfil not in df.columns:
+        raise ValueError(f"Coluna '{coluna_perfil}' não encontrada no arquivo.")
+        
+    colunas_extras = [coluna for coluna in (coluna_nome, coluna_perfil) if coluna]
+    valores, motivos = validar_pacientes(df.drop(columns=colunas_extras))
+    if coluna_perfil:
+        perfis = df[coluna_perfil].astype('string').str.strip()
+        invalidos = (perfis.notna() & ~perfis.isin(list(PERFIS_RELATORIO))).fillna(False)
+        motivos = motivos.where(~invalidos, (motivos + '; ').str.lstrip('; ') +
+                                'perfil inválido: ' + perfis.astype(str))
+    rejeitadas = (motivos != '').to_numpy(copy=True)
+    
+    validos = df[~rejeitadas].copy()
+    validos[valores.columns] = valores[~rejeitadas]
+    return validos, validos.drop(columns=colunas_extras), motivos, rejeitadas
+
+def calcular_escores_bloco(df, dados, motivos, rejeitadas):
+    """
+    Calcula os escores e os percentis das linhas válidas de um bloco. Se o cálculo
+    falhar, todas as linhas do bloco passam a ser rejeitadas com o erro como motivo
+    (motivos e rejeitadas são atualizados) e o resultado é (None, None).
+    """
+    from risco_cardiaco import calcular_risco_lote
+    from populacao import COLUNAS_PERCENTIL, obter_contexto
+    
+    try:
+        escores = calcular_risco_lote(dados)
+        percentis = obter_contexto().calcular_percentis_lote(dados).reindex(
+            columns=[f'percentil_{coluna}' for coluna in COLUNAS_PERCENTIL])
+    except Exception as e:
+        # O motivo não pode ficar vazio: linhas sem motivo seguem para a geração
+        motivo = str(e) or type(e).__name__
+        print(f"Erro nas linhas {df.index[0] + 1} a {df.index[-1] + 1}: {motivo}")
+        motivos[~rejeitadas] = motivo
+        rejeitadas[:] = True
+        return None, None
+    return escores, percentis
+
+class SaidasLote:
+    """
+    Destinos dos resultados de um lote: o diário, o pacote (opcional), o resumo em
+    CSV (opcional) e o CSV de rejeitados, criado apenas se alguma linha for rejeitada
+    nesta execução. Conta os relatórios gerados, os erros e as linhas rejeitadas.
+    """
+    def __init__(self, diario, pacote=None, arquivo_resumo=None, caminho_rejeitados=None):
+        import csv
+        from populacao import COLUNAS_PERCENTIL
+        
+        self.diario = diario
+        self.pacote = pacote
+        self.caminho_rejeitados = caminho_rejeitados
+        self.relatorios = self.erros = self.rejeitadas = 0
+        self._rejeitados = None
+        if os.path.exists(caminho_rejeitados):
+            os.remove(caminho_rejeitados)
+        self._resumo = self._escritor_resumo = None
+        if arquivo_resumo:
+            self._resumo = open(arquivo_resumo, 'w', newline='', encoding='utf-8')
+            self._escritor_resumo = csv.writer(self._resumo)
+            self._escritor_resumo.writerow(['nome', 'arquivo', 'probabilidade_risco', 'categoria_risco'] +
+                                           [f'percentil_{coluna}' for coluna in COLUNAS_PERCENTIL] + ['erro'])
+        self._colunas_percentil = len(COLUNAS_PERCENTIL)
+        
+    def gravar_rejeitados(self, df, motivos, rejeitadas):
+        """
+        Acrescenta ao CSV de rejeitados as linhas rejeitadas do bloco, com os motivos
+        """
+        if not rejeitadas.any():
             return
+        cabecalho = self._rejeitados is None
+        if cabecalho:
+            self._rejeitados = open(self.caminho_rejeitados, 'w', newline='', encoding='utf-8')
+        # Linhas numeradas a partir de 1, como nas mensagens de erro
+        rejeitados = df[rejeitadas].assign(motivos=motivos[rejeitadas])
+        rejeitados.index = rejeitados.index + 1
+        rejeitados.to_csv(self._rejeitados, header=cabecalho, index_label='linha')
+        self._rejeitados.flush()
+        self.rejeitadas += int(rejeitadas.sum())
+        
+    def rejeitar(self, linha, nome, motivo):
+        print(f"Linha {linha + 1} ({nome}) rejeitada: {motivo}")
+        self.diario.registrar(linha, nome, None, motivo)
+        self._resumir(nome, '', '', '', [''] * self._colunas_percentil, motivo)
+        
+    def registrar(self, linha, nome, resultado, probabilidade, categoria, percentis, perfil):
+        """
+        Registra o resultado da geração do relatório de uma linha
+        """
+        _, arquivo, _, _, erro = resultado
+        if self.pacote is not None and erro is None:
+            # arquivo contém o PDF gerado em memória; no diário fica o nome da entrada
+            arquivo = self.pacote.adicionar(linha, nome, arquivo, probabilidade_risco=float(probabilidade),
+                                            categoria_risco=categoria, perfil=perfil)
+        self.diario.registrar(linha, nome, arquivo, erro)
+        self._resumir(nome, arquivo or '', probabilidade, categoria, percentis, erro or '')
+        if erro is None:
+            self.relatorios += 1
+            imprimir_resultado(nome, arquivo, probabilidade, categoria)
+        else:
+            self.erros += 1
+            print(f"Erro ao gerar relatório para {nome}: {erro}")
             
-        # Gerar relatórios para cada linha
-        relatorios_gerados = []
-        for i, row in df.iterrows():
-            # Determinar o nome do paciente
-            if coluna_nome:
-                nome = row[coluna_nome]
+    def registrar_concluido(self, nome, arquivo, probabilidade, categoria, percentis):
+        """
+        Inclui no resumo uma linha cujo relatório foi gerado numa execução anterior
+        """
+        self._resumir(nome, arquivo, probabilidade, categoria, percentis, '')
+        
+    def _resumir(self, nome, arquivo, probabilidade, categoria, percentis, erro):
+        import pandas as pd
+        if self._escritor_resumo:
+            self._escritor_resumo.writerow([nome, arquivo, probabilidade, categoria] +
+                                           ['' if p == '' or pd.isna(p) else f'{p:.1f}' for p in percentis] + [erro])
+            
+    def concluir_bloco(self):
+        if self._resumo is not None:
+            self._resumo.flush()
+            
+    def fechar(self):
+        for arquivo in (self._resumo, self._rejeitados):
+            if arquivo is not None:
+                arquivo.close()
+        self._resumo = self._rejeitados = None
+        
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+def gerar_bloco(df, validos, motivos, escores, percentis, saidas, *, coluna_nome=None, coluna_perfil=None,
+                opcoes=None, concluidos=None, executor=None):
+    """
+    Gera os relatórios das linhas válidas do bloco ainda não concluídas e registra
+    cada linha do bloco, na ordem do arquivo, nas saídas do lote
+    """
+    concluidos = concluidos or {}
+    tarefas = montar_tarefas(validos, coluna_nome, opcoes, coluna_perfil) if escores is not None else []
+    pendentes = [tarefa for linha, tarefa in zip(validos.index, tarefas) if linha not in concluidos]
+    resultados = gerar_relatorios_lote(pendentes, executor, em_memoria=saidas.pacote is not None)
+    linhas_validas = zip(tarefas, escores.join(percentis).itertuples(index=False)) if tarefas else iter([])
+    
+    # Nomes de todas as linhas (inclusive as rejeitadas), sem percorrer o bloco de novo
+    nomes = df[coluna_nome] if coluna_nome else (f"Paciente_{i+1}" for i in df.index)
+    for linha, nome, motivo in zip(df.index, nomes, motivos):
+        if motivo:
+            saidas.rejeitar(linha, nome, motivo)
+            continue
+        (_, _, opcoes_linha), (probabilidade, categoria, *percentis_linha) = next(linhas_validas)
+        if linha in concluidos:
+            saidas.registrar_concluido(nome, concluidos[linha]['arquivo'], probabilidade, categoria, percentis_linha)
+        else:
+            saidas.registrar(linha, nome, next(resultados), probabilidade, categoria, percentis_linha,
+                             opcoes_linha.get('perfil', 'completo'))
+    saidas.concluir_bloco()
+
+def processar_arquivo_csv(arquivo_csv, coluna_nome=None, workers=1, tamanho_bloco=None, *, arquivo_resumo=None,
+                          opcoes=None, caminho_diario=None, retomar=False, caminho_rejeitados=None,
+                          caminho_pacote=None, coluna_perfil=None, caminho_coorte=None):
+    """
+    Processa um arquivo CSV com dados de múltiplos pacientes.
+    Com workers > 1 os relatórios são gerados em paralelo por um pool de processos.
+    Com tamanho_bloco o arquivo é lido em blocos de tamanho fixo (modo streaming),
+    sem manter o arquivo nem a lista de relatórios em memória.
+    Com arquivo_resumo o resumo é gravado em CSV à medida que cada bloco termina.
+    opcoes são repassadas a cada RelatorioRiscoCardiaco.
+    Cada paciente processado é registrado no diário do lote (caminho_diario); com
+    retomar os relatórios já registrados no diário não são gerados novamente.
+    As linhas que não passam na validação são gravadas, com os motivos, no CSV de
+    rejeitados (caminho_rejeitados) e não chegam à geração de relatórios.
+    Com caminho_pacote os PDFs são gerados em memória e gravados em um único
+    pacote zip ou tar com manifesto, em vez de um arquivo por paciente.
+    Com coluna_perfil, cada linha pode escolher o perfil do relatório (ex.: 'triagem');
+    linhas com a coluna vazia usam o perfil de opcoes.
+    Ao final, o resumo da coorte (categorias, fatores de risco e comparação com a
+    população) é gravado em <caminho_coorte>.json e <caminho_coorte>.pdf.
+    Devolve False se o processamento foi interrompido por um erro.
+    """
+    import pandas as pd
+    from contextlib import ExitStack
+    from coorte_lote import ResumoCoorte
+    from diario_lote import DiarioLote, relatorios_concluidos
+    from gerador_relatorio_pdf_simplificado import PERFIS_RELATORIO
+    from metricas_relatorios import configuracao_metricas, registrar_evento
+    from pacote_relatorios import PacoteRelatorios
+    from populacao import obter_contexto
+    
+    caminho_rejeitados = caminho_rejeitados or f'{os.path.basename(arquivo_csv)}.rejeitados.csv'
+    caminho_coorte = caminho_coorte or f'{os.path.basename(arquivo_csv)}.coorte'
+    coorte = ResumoCoorte()
+    inicio = time.perf_counter()
+    try:
+        with ExitStack() as recursos:
+            # Diário do lote: novo ou retomado a partir dos pacientes já concluídos
+            diario = recursos.enter_context(DiarioLote(caminho_diario or DiarioLote.caminho_padrao(arquivo_csv)))
+            perfil = (opcoes or {}).get('perfil', 'completo')
+            parametros = {'graficos': (opcoes or {}).get('graficos', 'vetorial'), 'perfil': perfil,
+                          'coluna_perfil': coluna_perfil, 'imagens': (opcoes or {}).get('imagens')}
+            cabecalho = DiarioLote.cabecalho(arquivo_csv, coluna_nome, parametros)
+            concluidos = {}
+            if retomar and os.path.exists(diario.caminho):
+                concluidos = relatorios_concluidos(diario.retomar(cabecalho))
+                print(f"Retomando o lote: {len(concluidos)} relatório(s) já gerado(s) em {diario.caminho}")
             else:
-                nome = f"Paciente_{i+1}"
+                diario.iniciar(cabecalho)
                 
-            # Extrair dados relevantes (excluindo a coluna de nome se existir)
-            dados = row.drop(coluna_nome) if coluna_nome else row
-            
-            # Gerar relatório
-            try:
-                arquivo = gerar_relatorio_individual(nome, dados)
-                relatorios_gerados.append((nome, arquivo))
-            except Exception as e:
-                print(f"Erro ao gerar relatório para {nome}: {str(e)}")
+            # Pacote com todos os relatórios (o manifesto é gravado ao fechar)
+            pacote = None
+            if caminho_pacote:
+                pacote = recursos.enter_context(PacoteRelatorios(caminho_pacote, {
+                    'entrada_sha256': cabecalho['entrada_sha256'],
+                    'populacao_sha256': obter_contexto().impressao_digital,
+                    'parametros': parametros
+                }))
+                
+            # Carregar o arquivo CSV inteiro ou em blocos
+            if tamanho_bloco:
+                blocos = recursos.enter_context(pd.read_csv(arquivo_csv, chunksize=tamanho_bloco))
+            else:
+                blocos = [pd.read_csv(arquivo_csv)]
+                
+            executor = None
+            if workers > 1:
+                # O matplotlib só é carregado nos processos se algum relatório puder usá-lo
+                usa_pyplot = parametros['graficos'] == 'matplotlib' and \
+                    (coluna_perfil is not None or 'visualizacoes' in PERFIS_RELATORIO[perfil])
+                executor = recursos.enter_context(
+                    ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                                        initargs=(configuracao_metricas(), usa_pyplot)))
+                
+            saidas = recursos.enter_context(SaidasLote(diario, pacote, arquivo_resumo, caminho_rejeitados))
+            for df in blocos:
+                validos, dados, motivos, rejeitadas = validar_bloco(df, coluna_nome, coluna_perfil)
+                escores, percentis = calcular_escores_bloco(df, dados, motivos, rejeitadas)
+                if escores is not None:
+                    # Agregados da coorte acumulados com os escores já calculados, sem reler o arquivo
+                    coorte.atualizar(dados, escores, percentis)
+                saidas.gravar_rejeitados(df, motivos, rejeitadas)
+                gerar_bloco(df, validos, motivos, escores, percentis, saidas, coluna_nome=coluna_nome,
+                            coluna_perfil=coluna_perfil, opcoes=opcoes, concluidos=concluidos, executor=executor)
+                    
+        coorte.salvar(f'{caminho_coorte}.json', f'{caminho_coorte}.pdf', entrada=arquivo_csv,
+                      entrada_sha256=cabecalho['entrada_sha256'], rejeitadas=saidas.rejeitadas)
+        registrar_evento('lote', entrada=arquivo_csv, workers=workers, relatorios=saidas.relatorios,
+                         erros=saidas.erros, rejeitadas=saidas.rejeitadas,
+                         duracao_s=round(time.perf_counter() - inicio, 3))
         
-        # Mostrar resumo
-        if relatorios_gerados:
-            print("\nResumo dos relatórios gerados:")
-            for nome, arquivo in relatorios_gerados:
-                print(f"- {nome}: {arquivo}")
+        # Mostrar resumo a partir do diário (inclui os relatórios de execuções anteriores)
+        if tamanho_bloco:
+            # Em blocos o diário é apenas contado, sem carregar os registros na memória
+            gerados, erros = diario.contar()
+            print(f"\nRelatórios gerados: {gerados} (erros: {erros})")
+        else:
+            _, registros = diario.ler()
+            gerados = [registro for registro in registros.values() if registro['erro'] is None]
+            if gerados:
+                print("\nResumo dos relatórios gerados:")
+                for registro in gerados:
+                    print(f"- {registro['nome']}: {registro['arquivo']}")
+        print(f"Diário do lote: {diario.caminho}")
+        if saidas.rejeitadas:
+            print(f"Linhas rejeitadas: {saidas.rejeitadas} (motivos em: {caminho_rejeitados})")
+        if arquivo_resumo:
+            print(f"Resumo salvo em: {arquivo_resumo}")
+        if caminho_pacote:
+            print(f"Pacote de relatórios salvo em: {caminho_pacote}")
+        print(f"Resumo da coorte salvo em: {caminho_coorte}.pdf e {caminho_coorte}.json")
+        return True
                 
     except Exception as e:
         print(f"Erro ao processar arquivo CSV: {str(e)}")
+        return False
 
-def coletar_dados_manual():
+def processar_escores_csv(arquivo_csv, arquivo_saida):
+    """
+    Calcula apenas os escores de risco de um arquivo CSV, sem gerar PDFs,
+    e salva os dados de entrada acrescidos do índice e da categoria de risco
+    """
+    import pandas as pd
+    from risco_cardiaco import calcular_risco_lote
+    from populacao import obter_contexto
+    
+    try:
+        df = pd.read_csv(arquivo_csv)
+        escores = calcular_risco_lote(df)
+        percentis = obter_contexto().calcular_percentis_lote(df).round(1)
+        df.join(escores).join(percentis).to_csv(arquivo_saida, index=False)
+        
+        # Mostrar resumo por categoria
+        print(f"\nEscores de {len(df)} pacientes salvos em: {arquivo_saida}")
+        contagem = escores['categoria_risco'].value_counts()
+        for categoria in ["Baixo", "Moderado", "Alto"]:
+            print(f"- {categoria}: {contagem.get(categoria, 0)}")
+        return True
+            
+    except Exception as e:
+        print(f"Erro ao processar arquivo CSV: {str(e)}")
+        return False
+
+def coletar_dados_manual(opcoes=None):
     """
     Coleta dados de um paciente manualmente via linha de comando
     """
@@ -111,15 +475,11 @@ def coletar_dados_manual():
     
     # Gerar relatório
     try:
-        gerar_relatorio_individual(nome, dados)
+        gerar_relatorio_individual(nome, dados, opcoes)
     except Exception as e:
         print(f"Erro ao gerar relatório: {str(e)}")
 
 def main():
-    # Verificar se os arquivos necessários existem
-    if not verificar_arquivos_necessarios():
-        return
-    
     # Configurar argumentos da linha de comando
     parser = argparse.ArgumentParser(description='Gerador de Relatórios de Risco Cardiovascular')
     
@@ -133,15 +493,145 @@ def main():
     # Opção adicional para o modo CSV
     parser.add_argument('-n', '--nome-coluna', type=str, 
                       help='Nome da coluna com os nomes dos pacientes (para modo CSV)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                      help='Número de processos para gerar relatórios em paralelo (para modo CSV)')
+    parser.add_argument('-b', '--tamanho-bloco', type=int,
+                      help='Ler o CSV em blocos com este número de linhas, com memória constante (para modo CSV)')
+    parser.add_argument('--resumo', type=str, metavar='ARQUIVO_RESUMO',
+                      help='Gravar o resumo do lote neste CSV à medida que os relatórios são gerados (para modo CSV)')
+    parser.add_argument('--diario', type=str, metavar='ARQUIVO_DIARIO',
+                      help='Diário do lote com os pacientes já processados (padrão: <nome do CSV>.diario.jsonl no diretório atual) (para modo CSV)')
+    parser.add_argument('--retomar', action='store_true',
+                      help='Retomar um lote interrompido, sem gerar de novo os relatórios registrados no diário (para modo CSV)')
+    parser.add_argument('--rejeitados', type=str, metavar='ARQUIVO_REJEITADOS',
+                      help='CSV com as linhas rejeitadas na validação e os motivos (padrão: <nome do CSV>.rejeitados.csv no diretório atual) (para modo CSV)')
+    parser.add_argument('--pacote', type=str, metavar='ARQUIVO_PACOTE',
+                      help='Gravar todos os relatórios em um único pacote .zip, .tar ou .tar.gz com manifesto, '
+                           'em vez de um PDF por paciente (para modo CSV)')
+    parser.add_argument('--coorte', type=str, metavar='PREFIXO',
+                      help='Prefixo dos arquivos .json e .pdf com o resumo da coorte (padrão: <nome do CSV>.coorte no diretório atual) '
+                           '(para modo CSV)')
+    parser.add_argument('-g', '--graficos', choices=['vetorial', 'matplotlib'], default='vetorial',
+                      help='Desenhar os gráficos como vetores do PDF (padrão) ou como imagens do matplotlib')
+    parser.add_argument('--dpi-graficos', type=int, metavar='DPI',
+                      help='Resolução das imagens dos gráficos na página (padrão: cerca de 160) (com -g matplotlib)')
+    parser.add_argument('--codificacao-graficos', choices=['rgb', 'paleta', 'jpeg'],
+                      help='Codificação das imagens dos gráficos: rgb sem perdas (padrão), paleta de 256 cores '
+                           'ou jpeg (com -g matplotlib)')
+    parser.add_argument('--compressao-graficos', type=int, metavar='NIVEL',
+                      help='Nível de compressão zlib das imagens, de 0 a 9 (padrão: 6) (com -g matplotlib)')
+    parser.add_argument('--qualidade-jpeg', type=int, metavar='QUALIDADE',
+                      help='Qualidade das imagens jpeg, de 1 a 95 (padrão: 85) (com -g matplotlib)')
+    parser.add_argument('-p', '--perfil-relatorio', choices=['completo', 'triagem'], default='completo',
+                      help='Páginas do relatório: completo (padrão) ou triagem (resumo, detalhes e '
+                           'recomendações, sem visualizações)')
+    parser.add_argument('--coluna-perfil', type=str, metavar='NOME_COLUNA',
+                      help='Coluna do CSV com o perfil de relatório de cada linha; linhas vazias usam '
+                           '--perfil-relatorio (para modo CSV)')
+    parser.add_argument('-e', '--escores', type=str, metavar='ARQUIVO_SAIDA',
+                      help='Apenas calcular os escores e salvá-los neste CSV, sem gerar PDFs (para modo CSV)')
+    parser.add_argument('--cache', type=str, metavar='DIRETORIO',
+                      help='Reaproveitar relatórios já gerados para os mesmos dados, guardados neste diretório')
+    parser.add_argument('--cache-max-mb', type=int, default=1024,
+                      help='Tamanho máximo do cache em MB; os relatórios usados há mais tempo são removidos (padrão: 1024)')
+    parser.add_argument('--metricas', type=str, metavar='ARQUIVO_METRICAS',
+                      help="Gravar métricas de cada relatório (duração por etapa, bytes, erros) em JSON lines "
+                           "neste arquivo ('-' para a saída padrão)")
+    parser.add_argument('--perfil-amostra', type=int, default=0, metavar='N',
+                      help='Executar 1 a cada N relatórios sob cProfile e tracemalloc (requer --metricas)')
+    parser.add_argument('--perfil-dir', type=str, default='perfis_relatorios', metavar='DIRETORIO',
+                      help='Diretório dos perfis cProfile dos relatórios amostrados (padrão: perfis_relatorios)')
     
     # Analisar argumentos
     args = parser.parse_args()
     
+    if args.workers < 1:
+        parser.error('--workers deve ser maior ou igual a 1')
+    if args.tamanho_bloco is not None and args.tamanho_bloco < 1:
+        parser.error('--tamanho-bloco deve ser maior ou igual a 1')
+    if args.escores and not args.csv:
+        parser.error('--escores requer o modo CSV (-c)')
+    if (args.retomar or args.diario or args.rejeitados) and (not args.csv or args.escores):
+        parser.error('--retomar, --diario e --rejeitados requerem o modo CSV (-c) com geração de relatórios')
+    if args.coorte and (not args.csv or args.escores):
+        parser.error('--coorte requer o modo CSV (-c) com geração de relatórios')
+    if args.coluna_perfil and (not args.csv or args.escores):
+        parser.error('--coluna-perfil requer o modo CSV (-c) com geração de relatórios')
+    if args.pacote and (not args.csv or args.escores):
+        parser.error('--pacote requer o modo CSV (-c) com geração de relatórios')
+    if args.pacote and args.retomar:
+        parser.error('--retomar não pode ser usado com --pacote (o pacote de um lote interrompido fica incompleto)')
+    if args.pacote and formato_pacote(args.pacote) is None:
+        parser.error(f"--pacote deve terminar em {', '.join(FORMATOS_PACOTE)}")
+    imagens = {opcao: valor for opcao, valor in (('dpi', args.dpi_graficos),
+                                                 ('codificacao', args.codificacao_graficos),
+                                                 ('compressao', args.compressao_graficos),
+                                                 ('qualidade', args.qualidade_jpeg)) if valor is not None}
+    if imagens and args.graficos != 'matplotlib':
+        parser.error('--dpi-graficos, --codificacao-graficos, --compressao-graficos e --qualidade-jpeg '
+                     'requerem -g matplotlib')
+    if imagens:
+        from gerador_relatorio_pdf_simplificado import validar_opcoes_imagem
+        try:
+            validar_opcoes_imagem(imagens)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.cache_max_mb < 0:
+        parser.error('--cache-max-mb deve ser maior ou igual a 0')
+    if args.perfil_amostra < 0:
+        parser.error('--perfil-amostra deve ser maior ou igual a 0')
+    if args.perfil_amostra and not args.metricas:
+        parser.error('--perfil-amostra requer --metricas')
+    if args.metricas and args.escores:
+        parser.error('--metricas requer a geração de relatórios (não pode ser usado com --escores)')
+    
+    # Verificar se os arquivos necessários existem
+    if not verificar_arquivos_necessarios():
+        sys.exit(1)
+    
+    # Opções repassadas a cada relatório
+    opcoes = {'graficos': args.graficos, 'perfil': args.perfil_relatorio}
+    if imagens:
+        opcoes['imagens'] = imagens
+    cache = None
+    if args.cache and not args.escores:
+        from cache_relatorios import CacheRelatorios
+        cache = CacheRelatorios(args.cache, args.cache_max_mb)
+        opcoes['cache'] = cache
+    
+    # Instrumentar a geração de relatórios apenas quando solicitado
+    if args.metricas:
+        from metricas_relatorios import ativar_metricas
+        ativar_metricas(args.metricas, args.perfil_amostra, args.perfil_dir)
+    
     # Executar modo apropriado
+    sucesso = True
     if args.manual:
-        coletar_dados_manual()
+        coletar_dados_manual(opcoes)
+    elif args.escores:
+        sucesso = processar_escores_csv(args.csv, args.escores)
     elif args.csv:
-        processar_arquivo_csv(args.csv, args.nome_coluna)
+        sucesso = processar_arquivo_csv(args.csv, args.nome_coluna, args.workers, args.tamanho_bloco,
+                                        arquivo_resumo=args.resumo, opcoes=opcoes, caminho_diario=args.diario,
+                                        retomar=args.retomar, caminho_rejeitados=args.rejeitados,
+                                        caminho_pacote=args.pacote, coluna_perfil=args.coluna_perfil,
+                                        caminho_coorte=args.coorte)
+    
+    # Limitar o tamanho do cache ao final da execução
+    if cache is not None:
+        removidos = cache.limpar()
+        if removidos:
+            print(f"Relatórios removidos do cache: {removidos}")
+    
+    if args.metricas:
+        from metricas_relatorios import desativar_metricas
+        desativar_metricas()
+        if args.metricas != '-':
+            print(f"Métricas salvas em: {args.metricas}")
+    
+    # Código de saída diferente de zero quando o processamento do CSV falhou
+    if not sucesso:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Chamadas que produzem um relatório: cada uma gera um registro de métricas
+METODOS_RELATORIO = ['gerar_relatorio', 'gerar_pdf']
+
+# Etapas medidas dentro de um relatório: métodos de RelatorioRiscoCardiaco e funções
+# de gráficos do módulo gerador. As durações são inclusivas (uma página inclui os
+# gráficos desenhados nela).
+METODOS_MEDIDOS = ['gerar_pagina_resumo', 'gerar_pagina_detalhes', 'gerar_pagina_visualizacoes',
+                   'gerar_pagina_recomendacoes', 'desenhar_radar_vetorial', 'desenhar_comparativo_vetorial',
+                   'imagem_em_memoria', 'output']
+FUNCOES_MEDIDAS = ['criar_grafico_radar', 'criar_grafico_comparativo']
+
+# Locais de alocação listados nos relatórios perfilados com tracemalloc
+MAXIMO_ALOCACOES = 5
+
+class ColetorMetricas:
+    """
+    Grava as métricas em JSON lines: um registro por relatório (duração, bytes
+    gerados, erro e duração de cada etapa) e eventos avulsos como o resumo do lote.
+    Cada registro é escrito com uma única chamada em modo de acréscimo, para que
+    vários processos possam compartilhar o mesmo arquivo. Um a cada amostra_perfil
+    relatórios é executado sob cProfile e tracemalloc; o perfil é salvo em
+    diretorio_perfil e o pico de memória e os maiores locais de alocação vão para o registro.
+    Com destino '-', os registros vão para a saída padrão original (descritor 1).
+    """
+    def __init__(self, destino='-', amostra_perfil=0, diretorio_perfil='perfis_relatorios'):
+        self.destino = destino
+        self.amostra_perfil = amostra_perfil
+        self.diretorio_perfil = diretorio_perfil
+        self.atual = None
+        self.sequencia = 0
+        if destino == '-':
+            self._descritor = os.dup(1)
+        else:
+            self._descritor = os.open(destino, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if amostra_perfil:
+            os.makedirs(diretorio_perfil, exist_ok=True)
+
+    def configuracao(self):
+        """
+        Parâmetros para criar um coletor equivalente em outro processo
+        """
+        return {'destino': self.destino, 'amostra_perfil': self.amostra_perfil,
+                'diretorio_perfil': self.diretorio_perfil}
+
+    def gravar(self, registro):
+        linha = json.dumps(registro, ensure_ascii=False, default=str) + '\n'
+        os.write(self._descritor, linha.encode('utf-8'))
+
+    def evento(self, evento, **campos):
+        self.gravar(dict({'evento': evento, 'data': datetime.now().isoformat(timespec='milliseconds'),
+                          'pid': os.getpid()}, **campos))
+
+    def medir_relatorio(self, relatorio, metodo, chamar):
+        """
+        Executa a geração de um relatório registrando sua duração, tamanho e etapas
+        """
+        self.sequencia += 1
+        self.atual = registro = {
+            'evento': 'relatorio',
+            'data': datetime.now().isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'sequencia': self.sequencia,
+            'metodo': metodo,
+            'graficos': relatorio.graficos,
+            'etapas': {}
+        }
+        perfilar = self.amostra_perfil and self.sequencia % self.amostra_perfil == 0
+        if perfilar:
+            perfil = cProfile.Profile()
+            tracemalloc.start()
+            perfil.enable()
+        inicio = time.perf_counter()
+        resultado = None
+        try:
+            resultado = chamar()
+            return resultado
+        except Exception as e:
+            registro['erro'] = str(e)
+            raise
+        finally:
+            registro['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+            if perfilar:
+                perfil.disable()
+                registro.update(self._resultado_perfil(perfil))
+            registro['bytes'] = self._tamanho(resultado)
+            registro.setdefault('erro', None)
+            for etapa in registro['etapas'].values():
+                etapa['ms'] = round(etapa['ms'], 3)
+            self.atual = None
+            self.gravar(registro)
+
+    def _resultado_perfil(self, perfil):
+        _, pico = tracemalloc.get_traced_memory()
+        alocacoes = tracemalloc.take_snapshot().statistics('lineno')[:MAXIMO_ALOCACOES]
+        tracemalloc.stop()
+        caminho = os.path.join(self.diretorio_perfil, f'relatorio_{os.getpid()}_{self.sequencia}.prof')
+        perfil.dump_stats(caminho)
+        return {
+            'perfil': caminho,
+            'memoria_pico_kb': round(pico / 1024, 1),
+            'alocacoes': [{'local': f'{estatistica.traceback[0].filename}:{estatistica.traceback[0].lineno}',
+                           'kb': round(estatistica.size / 1024, 1)} for estatistica in alocacoes]
+        }
+
+    @staticmethod
+    def _tamanho(resultado):
+        # gerar_pdf devolve os bytes do PDF; gerar_relatorio, o nome do arquivo gravado
+        if isinstance(resultado, bytes):
+            return len(resultado)
+        if isinstance(resultado, str) and os.path.exists(resultado):
+            return os.path.getsize(resultado)
+        return None
+
+    def fechar(self):
+        if self._descritor is not None:
+            os.close(self._descritor)
+            self._descritor = None
+
+# Coletor do processo, implementações originais das funções instrumentadas e a
+# saída padrão substituída enquanto as métricas vão para ela
+_coletor = None
+_originais = {}
+_saida_padrao = None
+
+def _envolver_relatorio(metodo, nome):
+    @functools.wraps(metodo)
+    def envolvido(self, *args, **kwargs):
+        if _coletor is None or _coletor.atual is not None:
+            return metodo(self, *args, **kwargs)
+        return _coletor.medir_relatorio(self, nome, lambda: metodo(self, *args, **kwargs))
+    return envolvido
+
+def _envolver_etapa(funcao, nome):
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        registro = _coletor.atual if _coletor is not None else None
+        if registro is None:
+            return funcao(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            etapa = registro['etapas'].setdefault(nome, {'chamadas': 0, 'ms': 0.0})
+            etapa['chamadas'] += 1
+            etapa['ms'] += (time.perf_counter() - inicio) * 1000
+    return envolvida
+
+def ativar_metricas(destino='-', amostra_perfil=0, diretorio_perfil='perfis_relatorios'):
+    """
+    Instrumenta a geração de relatórios neste processo. Sem ativação nada é envolvido
+    e a geração não tem custo adicional. Com destino '-', as mensagens do programa
+    passam para a saída de erro, e a saída padrão fica apenas com as métricas.
+    """
+    global _coletor, _saida_padrao
+    import gerador_relatorio_pdf_simplificado as gerador
+    from gerador_relatorio_pdf_simplificado import RelatorioRiscoCardiaco
+
+    desativar_metricas()
+    _coletor = ColetorMetricas(destino, amostra_perfil, diretorio_perfil)
+    if destino == '-':
+        sys.stdout.flush()
+        _saida_padrao, sys.stdout = sys.stdout, sys.stderr
+    for nome in METODOS_RELATORIO + METODOS_MEDIDOS:
+        _originais[(RelatorioRiscoCardiaco, nome)] = getattr(RelatorioRiscoCardiaco, nome)
+    for nome in FUNCOES_MEDIDAS:
+        _originais[(gerador, nome)] = getattr(gerador, nome)
+
+    for nome in METODOS_RELATORIO:
+        setattr(RelatorioRiscoCardiaco, nome, _envolver_relatorio(_originais[(RelatorioRiscoCardiaco, nome)], nome))
+    for nome in METODOS_MEDIDOS:
+        setattr(RelatorioRiscoCardiaco, nome, _envolver_etapa(_originais[(RelatorioRiscoCardiaco, nome)], nome))
+    for nome in FUNCOES_MEDIDAS:
+        setattr(gerador, nome, _envolver_etapa(_originais[(gerador, nome)], nome))
+    return _coletor
+
+def desativar_metricas():
+    """
+    Restaura as funções originais e a saída padrão e fecha o destino das métricas
+    """
+    global _coletor, _saida_padrao
+    for (dono, nome), original in _originais.items():
+        setattr(dono, nome, original)
+    _originais.clear()
+    if _saida_padrao is not None:
+        sys.stdout, _saida_padrao = _saida_padrao, None
+    if _coletor is not None:
+        _coletor.fechar()
+        _coletor = None
+
+def configuracao_metricas():
+    """
+    Configuração do coletor ativo (para repassar aos processos do pool), ou None
+    """
+    return _coletor.configuracao() if _coletor is not None else None
+
+def registrar_evento(evento, **campos):
+    """
+    Grava um evento avulso (ex.: o resumo de um lote) se as métricas estiverem ativas
+    """
+    if _coletor is not None:
+        _coletor.evento(evento, **campos)
@@ -0,0 +1,99 @@
+import hashlib
+import io
+import json
+import re
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+
+# Formatos de pacote aceitos, pela extensão do arquivo
+FORMATOS_PACOTE = {'.zip': 'zip', '.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz'}
+
+# Entrada do pacote com a lista dos relatórios
+NOME_MANIFESTO = 'manifesto.json'
+
+def formato_pacote(caminho):
+    """
+    Formato do pacote ('zip' ou o modo de escrita do tarfile) a partir da extensão,
+    ou None se a extensão não for suportada
+    """
+    for extensao, formato in FORMATOS_PACOTE.items():
+        if caminho.lower().endswith(extensao):
+            return formato
+    return None
+
+def nome_entrada(linha, nome_paciente):
+    """
+    Nome do relatório dentro do pacote: o número da linha do CSV (a partir de 1)
+    garante nomes únicos mesmo para pacientes com o mesmo nome
+    """
+    nome_seguro = re.sub(r'[\\/:*?"<>|\s]+', '_', str(nome_paciente)).strip('_') or 'Paciente'
+    return f'Relatorio_Risco_Cardiaco_{int(linha) + 1:06d}_{nome_seguro}.pdf'
+
+class PacoteRelatorios:
+    """
+    Pacote zip ou tar com os relatórios de um lote. Os PDFs são recebidos em
+    memória e gravados diretamente no pacote, sem arquivos intermediários; ao
+    fechar, o manifesto (linha, nome, entrada, tamanho, SHA-256 e escore de cada
+    relatório) é acrescentado como última entrada. Se o lote for interrompido por
+    um erro, o manifesto é marcado como incompleto e registra o erro.
+    """
+    def __init__(self, caminho, informacoes=None):
+        self.caminho = caminho
+        self.formato = formato_pacote(caminho)
+        if self.formato is None:
+            raise ValueError(f"Formato de pacote não suportado: '{caminho}' (use {', '.join(FORMATOS_PACOTE)})")
+        self.informacoes = dict(informacoes or {})
+        self.relatorios = []
+        if self.formato == 'zip':
+            # Os PDFs já têm os conteúdos comprimidos: guardá-los sem nova compressão
+            self._arquivo = zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_STORED)
+        else:
+            self._arquivo = tarfile.open(caminho, self.formato)
+
+    def _gravar(self, entrada, conteudo):
+        if self.formato == 'zip':
+            info = zipfile.ZipInfo(entrada, date_time=time.localtime()[:6])
+            self._arquivo.writestr(info, conteudo)
+        else:
+            info = tarfile.TarInfo(entrada)
+            info.size = len(conteudo)
+            info.mtime = int(time.time())
+            self._arquivo.addfile(info, io.BytesIO(conteudo))
+
+    def adicionar(self, linha, nome_paciente, pdf, **informacoes):
+        """
+        Grava o PDF (bytes) de um paciente no pacote e devolve o nome da entrada
+        """
+        entrada = nome_entrada(linha, nome_paciente)
+        self._gravar(entrada, pdf)
+        self.relatorios.append(dict({
+            'linha': int(linha) + 1,
+            'nome': str(nome_paciente),
+            'entrada': entrada,
+            'tamanho': len(pdf),
+            'sha256': hashlib.sha256(pdf).hexdigest()
+        }, **informacoes))
+        return entrada
+
+    def fechar(self, erro=None):
+        """
+        Grava o manifesto e fecha o pacote; com erro, o manifesto indica que o lote não terminou
+        """
+        if self._arquivo is None:
+            return
+        manifesto = dict(self.informacoes, gerado_em=datetime.now().isoformat(timespec='seconds'),
+                         completo=erro is None)
+        if erro is not None:
+            manifesto['erro'] = erro
+        manifesto['relatorios'] = self.relatorios
+        self._gravar(NOME_MANIFESTO, json.dumps(manifesto, indent=4, ensure_ascii=False).encode('utf-8'))
+        self._arquivo.close()
+        self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, excecao, rastreamento):
+        self.fechar(None if excecao is None else str(excecao) or tipo.__name__)
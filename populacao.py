@@ -0,0 +1,554 @@
+import hashlib
+import json
+import os
+from functools import cached_property
+
+# Arquivos da população de referência gerados pela análise exploratória
+ARQUIVO_POPULACAO = 'framingham_clean.csv'
+ARQUIVO_ESTATISTICAS = 'estatisticas.json'
+ARQUIVO_DISTRIBUICOES = 'distribuicoes_populacao.json'
+ARQUIVO_BINARIO = 'populacao.bin'
+ARQUIVO_ESTRATOS = 'estratos_populacao.json'
+
+# Colunas usadas nos gráficos comparativos dos relatórios
+COLUNAS_DISTRIBUICAO = ['age', 'sysBP', 'BMI']
+
+# Fatores numéricos cujo percentil na população aparece nos relatórios e nas saídas em lote
+COLUNAS_PERCENTIL = ['age', 'sysBP', 'diaBP', 'BMI', 'glucose', 'totChol', 'heartRate']
+
+# Mesmos padrões do sns.histplot(kde=True): 200 pontos, sem extrapolar o intervalo dos dados
+PONTOS_KDE = 200
+
+# Estratos com menos pacientes que isso são comparados com a população inteira
+MINIMO_ESTRATO = 30
+
+# Formato binário da população: assinatura, tamanho do cabeçalho JSON, cabeçalho
+# e os arrays de cada coluna (na ordem das linhas, ordenados e ordenados dentro
+# de cada estrato), alinhados em 64 bytes
+ASSINATURA_BINARIO = b'POPBIN02'
+ALINHAMENTO_BINARIO = 64
+
+def calcular_impressao_digital(caminho):
+    """
+    Calcula o hash SHA-256 do conteúdo de um arquivo para identificar sua versão
+    """
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def calcular_distribuicao(valores, pontos_kde=PONTOS_KDE):
+    """
+    Calcula bordas e contagens do histograma e a curva KDE de uma coluna,
+    reproduzindo o que o sns.histplot(kde=True) desenha
+    """
+    import numpy as np
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[~np.isnan(valores)]
+    n = len(valores)
+
+    # Histograma com a mesma regra de bins do seaborn ('auto')
+    bordas = np.histogram_bin_edges(valores, bins='auto')
+    contagens, _ = np.histogram(valores, bins=bordas)
+
+    # KDE gaussiana com largura de banda pela regra de Scott
+    largura_banda = np.std(valores, ddof=1) * n ** (-1 / 5)
+    grade = np.linspace(valores.min(), valores.max(), pontos_kde)
+    densidade = np.zeros(pontos_kde)
+    for inicio in range(0, n, 10000):
+        z = (grade[:, None] - valores[None, inicio:inicio + 10000]) / largura_banda
+        densidade += np.exp(-0.5 * z ** 2).sum(axis=1)
+    densidade /= n * largura_banda * np.sqrt(2 * np.pi)
+
+    # Escalar a densidade para a mesma escala das contagens do histograma
+    curva = densidade * (contagens * np.diff(bordas)).sum()
+
+    return {
+        'bordas': [round(float(v), 6) for v in bordas],
+        'contagens': [int(v) for v in contagens],
+        'kde_x': [round(float(v), 6) for v in grade],
+        'kde_y': [round(float(v), 6) for v in curva]
+    }
+
+def calcular_distribuicoes(df, colunas=COLUNAS_DISTRIBUICAO):
+    """
+    Calcula as distribuições (histograma e KDE) de várias colunas da população
+    """
+    return {coluna: calcular_distribuicao(df[coluna]) for coluna in colunas}
+
+def _salvar_pre_calculo(caminho, chave, dados, impressao_digital):
+    """
+    Salva dados pré-calculados junto com a impressão digital da população que os originou
+    """
+    conteudo = {'populacao_sha256': impressao_digital, chave: dados}
+
+    # Gravar em arquivo temporário e renomear para não expor arquivos incompletos
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w') as f:
+        json.dump(conteudo, f)
+    os.replace(temporario, caminho)
+
+def _ler_pre_calculo(caminho, chave, impressao_digital):
+    """
+    Lê dados pré-calculados, ou None se o arquivo estiver ausente, inválido ou desatualizado
+    """
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'r') as f:
+            conteudo = json.load(f)
+        dados = conteudo[chave]
+    except (ValueError, KeyError):
+        return None
+    if conteudo.get('populacao_sha256') != impressao_digital:
+        return None
+    return dados
+
+def salvar_distribuicoes(distribuicoes, impressao_digital, caminho=ARQUIVO_DISTRIBUICOES):
+    """
+    Salva as distribuições junto com a impressão digital da população que as originou
+    """
+    _salvar_pre_calculo(caminho, 'distribuicoes', distribuicoes, impressao_digital)
+
+def ler_distribuicoes(impressao_digital, caminho=ARQUIVO_DISTRIBUICOES, colunas=COLUNAS_DISTRIBUICAO):
+    """
+    Lê as distribuições pré-calculadas da população.
+    Devolve None se o cache estiver ausente, incompleto ou desatualizado.
+    """
+    distribuicoes = _ler_pre_calculo(caminho, 'distribuicoes', impressao_digital)
+    if distribuicoes is None or not all(c in distribuicoes for c in colunas):
+        return None
+    return distribuicoes
+
+def calcular_resumo(df):
+    """
+    Calcula médias, mínimos e máximos das colunas numéricas da população
+    """
+    numericas = df.select_dtypes('number')
+    return {
+        'medias': numericas.mean().to_dict(),
+        'minimos': numericas.min().to_dict(),
+        'maximos': numericas.max().to_dict()
+    }
+
+def calcular_percentis(valores_ordenados, valores):
+    """
+    Percentil (0 a 100) de cada valor: porcentagem da população com valor menor,
+    obtida por busca binária nos valores ordenados. Valores nulos resultam em NaN.
+    """
+    import numpy as np
+    valores = np.asarray(valores, dtype=float)
+    percentis = np.searchsorted(valores_ordenados, valores, side='left') * (100 / len(valores_ordenados))
+    return np.where(np.isnan(valores), np.nan, percentis)
+
+def chaves_estrato(masculino, idade):
+    """
+    Chave do estrato (sexo e década de idade, ex.: 'feminino_40') de cada paciente;
+    vazia quando o sexo ou a idade não permitem classificá-lo
+    """
+    import numpy as np
+    masculino = np.asarray(masculino, dtype=float)
+    idade = np.asarray(idade, dtype=float)
+    validos = np.isin(masculino, (0, 1)) & ~np.isnan(idade)
+    decadas = np.where(validos, idade // 10 * 10, 0).astype(int).astype(str)
+    sexos = np.where(masculino == 1, 'masculino', 'feminino')
+    return np.where(validos, np.char.add(np.char.add(sexos, '_'), decadas), '')
+
+def chave_estrato(masculino, idade):
+    """
+    Chave do estrato de um paciente, ou None se não for possível classificá-lo
+    """
+    return str(chaves_estrato([masculino], [idade])[0]) or None
+
+def rotulo_estrato(chave):
+    """
+    Descrição legível de um estrato (ex.: 'Mulheres de 40 a 49 anos')
+    """
+    sexo, decada = chave.split('_')
+    grupo = 'Homens' if sexo == 'masculino' else 'Mulheres'
+    return f'{grupo} de {decada} a {int(decada) + 9} anos'
+
+def calcular_estratos(valores_por_estrato, colunas=COLUNAS_DISTRIBUICAO, minimo=MINIMO_ESTRATO):
+    """
+    Calcula o resumo (médias, mínimos e máximos) e as distribuições de cada
+    estrato com pelo menos minimo pacientes, a partir dos valores ordenados
+    de cada coluna por estrato ({coluna: {chave: valores}})
+    """
+    import numpy as np
+    estratos = {}
+    for chave, idades in valores_por_estrato.get('age', {}).items():
+        if len(idades) < minimo:
+            continue
+        resumo = {'medias': {}, 'minimos': {}, 'maximos': {}}
+        for coluna, por_estrato in valores_por_estrato.items():
+            valores = por_estrato.get(chave)
+            if valores is None or len(valores) == 0:
+                continue
+            resumo['medias'][coluna] = float(np.mean(valores, dtype=np.float64))
+            resumo['minimos'][coluna] = float(valores[0])
+            resumo['maximos'][coluna] = float(valores[-1])
+        estratos[chave] = {
+            'rotulo': rotulo_estrato(chave),
+            'n': len(idades),
+            'resumo': resumo,
+            'distribuicoes': {coluna: calcular_distribuicao(valores_por_estrato[coluna][chave]) for coluna in colunas}
+        }
+    return estratos
+
+def salvar_estratos(estratos, impressao_digital, caminho=ARQUIVO_ESTRATOS):
+    """
+    Salva o índice de estratos junto com a impressão digital da população que o originou
+    """
+    _salvar_pre_calculo(caminho, 'estratos', estratos, impressao_digital)
+
+def ler_estratos(impressao_digital, caminho=ARQUIVO_ESTRATOS):
+    """
+    Lê o índice de estratos pré-calculado, ou None se estiver ausente ou desatualizado
+    """
+    return _ler_pre_calculo(caminho, 'estratos', impressao_digital)
+
+class GrupoComparacao:
+    """
+    Grupo com que um paciente é comparado nos relatórios: seu estrato ou a população inteira
+    """
+    def __init__(self, rotulo, n, resumo, distribuicoes, valores_ordenados):
+        self.rotulo = rotulo
+        self.n = n
+        self.resumo = resumo
+        self.distribuicoes = distribuicoes
+        self.valores_ordenados = valores_ordenados
+
+    def percentil(self, coluna, valor):
+        """
+        Percentil de um valor do paciente no grupo
+        """
+        return float(calcular_percentis(self.valores_ordenados[coluna], [valor])[0])
+
+def escolher_tipo(inteiros, minimo, maximo, exato_float32):
+    """
+    Menor tipo numpy capaz de representar exatamente os valores de uma coluna
+    """
+    import numpy as np
+    if inteiros:
+        for tipo in (np.int8, np.int16, np.int32):
+            if np.iinfo(tipo).min <= minimo and maximo <= np.iinfo(tipo).max:
+                return np.dtype(tipo).str
+        return np.dtype(np.int64).str
+    return np.dtype(np.float32 if exato_float32 else np.float64).str
+
+def _alinhar(deslocamento):
+    return -(-deslocamento // ALINHAMENTO_BINARIO) * ALINHAMENTO_BINARIO
+
+def _estratos_do_bloco(bloco):
+    if 'male' not in bloco.columns or 'age' not in bloco.columns:
+        return None
+    return chaves_estrato(bloco['male'], bloco['age'])
+
+def salvar_populacao_binaria(obter_blocos, impressao_digital, caminho=ARQUIVO_BINARIO):
+    """
+    Grava as colunas numéricas da população em formato binário colunar, com o
+    menor tipo exato de cada coluna, uma cópia ordenada (sem nulos) dos valores
+    e uma cópia ordenada dentro de cada estrato de sexo e década de idade.
+    obter_blocos devolve um iterável de DataFrames com as linhas da população e
+    é chamada duas vezes, de modo que a memória usada se limita a um bloco.
+    """
+    import numpy as np
+
+    # Primeira passagem: número de linhas e faixa de valores de cada coluna
+    linhas = 0
+    perfis = {}
+    for bloco in obter_blocos():
+        linhas += len(bloco)
+        estratos = _estratos_do_bloco(bloco)
+        for coluna in bloco.select_dtypes('number').columns:
+            valores = bloco[coluna].to_numpy(dtype=float)
+            validos = valores[~np.isnan(valores)]
+            perfil = perfis.setdefault(coluna, {'validos': 0, 'nulos': False, 'inteiros': True, 'float32': True,
+                                                'minimo': np.inf, 'maximo': -np.inf, 'estratos': {}})
+            perfil['validos'] += len(validos)
+            if estratos is not None:
+                chaves, quantidades = np.unique(estratos[~np.isnan(valores) & (estratos != '')], return_counts=True)
+                for chave, quantidade in zip(chaves, quantidades):
+                    perfil['estratos'][str(chave)] = perfil['estratos'].get(str(chave), 0) + int(quantidade)
+            perfil['nulos'] = perfil['nulos'] or len(validos) < len(valores)
+            perfil['inteiros'] = perfil['inteiros'] and bool(np.all(validos == np.round(validos)))
+            perfil['float32'] = perfil['float32'] and bool(np.all(validos.astype(np.float32) == validos))
+            if len(validos):
+                perfil['minimo'] = min(perfil['minimo'], float(validos.min()))
+                perfil['maximo'] = max(perfil['maximo'], float(validos.max()))
+
+    # Layout do arquivo: cabeçalho seguido dos arrays alinhados
+    colunas = []
+    for coluna, perfil in perfis.items():
+        # Colunas com nulos precisam de um tipo float para representá-los
+        tipo = escolher_tipo(perfil['inteiros'] and not perfil['nulos'], perfil['minimo'], perfil['maximo'],
+                             perfil['float32'])
+        # Segmentos [início, quantidade] de cada estrato no array ordenado por estrato
+        segmentos = {}
+        inicio = 0
+        for chave in sorted(perfil['estratos']):
+            segmentos[chave] = [inicio, perfil['estratos'][chave]]
+            inicio += perfil['estratos'][chave]
+        colunas.append({'nome': coluna, 'tipo': tipo, 'validos': perfil['validos'], 'estratos': segmentos})
+    cabecalho = {'populacao_sha256': impressao_digital, 'linhas': linhas, 'colunas': colunas}
+    inicio_dados = 0
+    while True:
+        # Os deslocamentos fazem parte do cabeçalho: repetir até o tamanho do cabeçalho se estabilizar
+        deslocamento = inicio_dados
+        for coluna in colunas:
+            tamanho_item = np.dtype(coluna['tipo']).itemsize
+            coluna['deslocamento'] = deslocamento
+            deslocamento = _alinhar(deslocamento + linhas * tamanho_item)
+            coluna['deslocamento_ordenado'] = deslocamento
+            deslocamento = _alinhar(deslocamento + coluna['validos'] * tamanho_item)
+            coluna['deslocamento_estratos'] = deslocamento
+            deslocamento = _alinhar(deslocamento + sum(q for _, q in coluna['estratos'].values()) * tamanho_item)
+        texto = json.dumps(cabecalho).encode('utf-8')
+        necessario = _alinhar(len(ASSINATURA_BINARIO) + 8 + len(texto))
+        if necessario <= inicio_dados:
+            break
+        inicio_dados = necessario
+
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(ASSINATURA_BINARIO)
+        f.write(len(texto).to_bytes(8, 'little'))
+        f.write(texto)
+        f.truncate(deslocamento)
+
+    # Segunda passagem: copiar os valores de cada bloco para o arquivo mapeado em memória
+    mapa = np.memmap(temporario, dtype=np.uint8, mode='r+')
+    destinos = {c['nome']: np.ndarray((linhas,), c['tipo'], buffer=mapa, offset=c['deslocamento']) for c in colunas}
+    ordenados = {c['nome']: np.ndarray((c['validos'],), c['tipo'], buffer=mapa, offset=c['deslocamento_ordenado'])
+                 for c in colunas}
+    por_estrato = {c['nome']: {chave: np.ndarray((quantidade,), c['tipo'], buffer=mapa,
+                                                 offset=c['deslocamento_estratos'] + inicio * np.dtype(c['tipo']).itemsize)
+                               for chave, (inicio, quantidade) in c['estratos'].items()}
+                   for c in colunas}
+    inicio = 0
+    preenchidos = dict.fromkeys(destinos, 0)
+    preenchidos_estratos = {coluna: dict.fromkeys(segmentos, 0) for coluna, segmentos in por_estrato.items()}
+    for bloco in obter_blocos():
+        fim = inicio + len(bloco)
+        estratos = _estratos_do_bloco(bloco)
+        for coluna, destino in destinos.items():
+            valores = bloco[coluna].to_numpy(dtype=float)
+            destino[inicio:fim] = valores
+            presentes = ~np.isnan(valores)
+            validos = valores[presentes]
+            ordenados[coluna][preenchidos[coluna]:preenchidos[coluna] + len(validos)] = validos
+            preenchidos[coluna] += len(validos)
+            for chave, segmento in por_estrato[coluna].items():
+                valores_estrato = valores[presentes & (estratos == chave)]
+                posicao = preenchidos_estratos[coluna][chave]
+                segmento[posicao:posicao + len(valores_estrato)] = valores_estrato
+                preenchidos_estratos[coluna][chave] += len(valores_estrato)
+        inicio = fim
+    for ordenado in ordenados.values():
+        ordenado.sort()
+    for segmentos in por_estrato.values():
+        for segmento in segmentos.values():
+            segmento.sort()
+    mapa.flush()
+    del destinos, ordenados, por_estrato, mapa
+    os.replace(temporario, caminho)
+
+def abrir_populacao_binaria(impressao_digital, caminho=ARQUIVO_BINARIO):
+    """
+    Mapeia em memória a população binária, sem copiar nem converter os dados.
+    Devolve None se o arquivo estiver ausente, for de outro formato ou estiver desatualizado.
+    """
+    import numpy as np
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'rb') as f:
+            if f.read(len(ASSINATURA_BINARIO)) != ASSINATURA_BINARIO:
+                return None
+            tamanho = int.from_bytes(f.read(8), 'little')
+            cabecalho = json.loads(f.read(tamanho))
+    except ValueError:
+        return None
+    if cabecalho.get('populacao_sha256') != impressao_digital:
+        return None
+
+    # Os arrays são visões somente leitura do arquivo mapeado, compartilhadas entre processos
+    mapa = np.memmap(caminho, dtype=np.uint8, mode='r')
+    linhas = cabecalho['linhas']
+    return {
+        'linhas': linhas,
+        'colunas': {c['nome']: np.ndarray((linhas,), c['tipo'], buffer=mapa, offset=c['deslocamento'])
+                    for c in cabecalho['colunas']},
+        'ordenados': {c['nome']: np.ndarray((c['validos'],), c['tipo'], buffer=mapa, offset=c['deslocamento_ordenado'])
+                      for c in cabecalho['colunas']},
+        'estratos': {c['nome']: {chave: np.ndarray((quantidade,), c['tipo'], buffer=mapa,
+                                                   offset=c['deslocamento_estratos'] + inicio * np.dtype(c['tipo']).itemsize)
+                                 for chave, (inicio, quantidade) in c['estratos'].items()}
+                     for c in cabecalho['colunas']}
+    }
+
+class ContextoPopulacao:
+    """
+    Dados da população de referência carregados sob demanda, na primeira vez
+    em que cada um é usado, e mantidos em memória durante todo o processo.
+    Resumos e distribuições vêm dos arquivos pré-calculados quando estão
+    atualizados, e os valores da população vêm do arquivo binário mapeado em
+    memória, sem precisar ler o CSV da população.
+    """
+    def __init__(self, caminho_populacao=ARQUIVO_POPULACAO, caminho_estatisticas=ARQUIVO_ESTATISTICAS,
+                 caminho_distribuicoes=ARQUIVO_DISTRIBUICOES, caminho_binario=ARQUIVO_BINARIO,
+                 caminho_estratos=ARQUIVO_ESTRATOS):
+        self.caminho_populacao = caminho_populacao
+        self.caminho_estatisticas = caminho_estatisticas
+        self.caminho_distribuicoes = caminho_distribuicoes
+        self.caminho_binario = caminho_binario
+        self.caminho_estratos = caminho_estratos
+
+    @cached_property
+    def impressao_digital(self):
+        return calcular_impressao_digital(self.caminho_populacao)
+
+    @cached_property
+    def binario(self):
+        """
+        População binária mapeada em memória (None se ausente ou desatualizada)
+        """
+        return abrir_populacao_binaria(self.impressao_digital, self.caminho_binario)
+
+    @cached_property
+    def df(self):
+        import pandas as pd
+        if self.binario is not None:
+            # Colunas como visões dos arrays mapeados, sem copiar o arquivo para a memória
+            return pd.DataFrame(self.binario['colunas'], copy=False)
+        return pd.read_csv(self.caminho_populacao)
+
+    @cached_property
+    def estatisticas(self):
+        with open(self.caminho_estatisticas, 'r') as f:
+            return json.load(f)
+
+    @cached_property
+    def distribuicoes(self):
+        distribuicoes = ler_distribuicoes(self.impressao_digital, self.caminho_distribuicoes)
+        if distribuicoes is None:
+            distribuicoes = calcular_distribuicoes(self.df)
+            try:
+                salvar_distribuicoes(distribuicoes, self.impressao_digital, self.caminho_distribuicoes)
+            except OSError:
+                # Sem permissão de escrita: usar as distribuições apenas em memória
+                pass
+        return distribuicoes
+
+    @cached_property
+    def resumo(self):
+        """
+        Médias, mínimos e máximos da população (de estatisticas.json, se atualizado)
+        """
+        estatisticas = self.estatisticas
+        chaves = ('medias', 'minimos', 'maximos')
+        if estatisticas.get('populacao_sha256') == self.impressao_digital and all(c in estatisticas for c in chaves):
+            return {chave: estatisticas[chave] for chave in chaves}
+        return calcular_resumo(self.df)
+
+    @cached_property
+    def valores_ordenados(self):
+        """
+        Valores ordenados (sem nulos) de cada coluna numérica da população
+        """
+        import numpy as np
+        if self.binario is not None:
+            return self.binario['ordenados']
+        df = self.df.select_dtypes('number')
+        return {coluna: np.sort(df[coluna].dropna().to_numpy()) for coluna in df.columns}
+
+    @cached_property
+    def valores_por_estrato(self):
+        """
+        Valores ordenados (sem nulos) de cada coluna numérica dentro de cada estrato
+        """
+        import numpy as np
+        if self.binario is not None:
+            return self.binario['estratos']
+        df = self.df.select_dtypes('number')
+        if 'male' not in df.columns or 'age' not in df.columns:
+            return {}
+        chaves = chaves_estrato(df['male'], df['age'])
+        resultado = {}
+        for coluna in df.columns:
+            valores = df[coluna].to_numpy(dtype=float)
+            validos = ~np.isnan(valores) & (chaves != '')
+            resultado[coluna] = {chave: np.sort(valores[validos][chaves[validos] == chave])
+                                 for chave in np.unique(chaves[validos]).tolist()}
+        return resultado
+
+    @cached_property
+    def estratos(self):
+        """
+        Índice de estratos (sexo x década de idade) com resumo e distribuições de cada um
+        """
+        estratos = ler_estratos(self.impressao_digital, self.caminho_estratos)
+        if estratos is None:
+            estratos = calcular_estratos(self.valores_por_estrato)
+            try:
+                salvar_estratos(estratos, self.impressao_digital, self.caminho_estratos)
+            except OSError:
+                # Sem permissão de escrita: usar o índice apenas em memória
+                pass
+        return estratos
+
+    def grupo_comparacao(self, dados):
+        """
+        Grupo de comparação de um paciente: seu estrato de sexo e década de idade
+        ou, se ele não puder ser classificado ou o estrato for pequeno, a população inteira
+        """
+        chave = None
+        if 'male' in dados and 'age' in dados:
+            chave = chave_estrato(dados['male'], dados['age'])
+        estrato = self.estratos.get(chave)
+        if estrato is None:
+            return GrupoComparacao(None, None, self.resumo, self.distribuicoes, self.valores_ordenados)
+        valores_ordenados = {coluna: por_estrato[chave] for coluna, por_estrato in self.valores_por_estrato.items()
+                             if chave in por_estrato}
+        return GrupoComparacao(estrato['rotulo'], estrato['n'], estrato['resumo'], estrato['distribuicoes'],
+                               valores_ordenados)
+
+    def percentil(self, coluna, valor):
+        """
+        Percentil de um valor do paciente na população
+        """
+        return float(calcular_percentis(self.valores_ordenados[coluna], [valor])[0])
+
+    def calcular_percentis_lote(self, df, colunas=COLUNAS_PERCENTIL):
+        """
+        Percentis de todos os pacientes de um DataFrame, em colunas percentil_<fator>
+        (fatores ausentes do DataFrame são ignorados)
+        """
+        import pandas as pd
+        return pd.DataFrame({f'percentil_{coluna}': calcular_percentis(self.valores_ordenados[coluna],
+                                                                        df[coluna].to_numpy(dtype=float))
+                             for coluna in colunas if coluna in df.columns}, index=df.index)
+
+    def carregar(self):
+        """
+        Força o carregamento dos dados usados nos relatórios (ex.: ao iniciar um processo do pool)
+        """
+        self.estatisticas
+        self.binario
+        self.valores_ordenados
+        self.resumo
+        self.distribuicoes
+        self.estratos
+        return self
+
+_contexto = None
+
+def obter_contexto():
+    """
+    Devolve o contexto da população compartilhado pelo processo, criando-o no primeiro uso
+    """
+    global _contexto
+    if _contexto is None:
+        _contexto = ContextoPopulacao()
+    return _contexto
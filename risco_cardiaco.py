@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+from populacao import obter_contexto
+
+# Colunas de um paciente (mesmo formato do arquivo CSV de entrada, sem o nome)
+COLUNAS_PACIENTE = ['age', 'male', 'currentSmoker', 'cigsPerDay', 'BPMeds', 'prevalentStroke',
+                    'prevalentHyp', 'diabetes', 'totChol', 'sysBP', 'diaBP', 'BMI', 'heartRate', 'glucose']
+
+# Indicadores que só podem valer 0 ou 1
+COLUNAS_BINARIAS = ['male', 'currentSmoker', 'BPMeds', 'prevalentStroke', 'prevalentHyp', 'diabetes']
+
+# Faixas plausíveis (mínimo, máximo) das colunas numéricas de um paciente
+FAIXAS_VALIDAS = {
+    'age': (0, 120),
+    'cigsPerDay': (0, 100),
+    'totChol': (50, 1000),
+    'sysBP': (50, 300),
+    'diaBP': (30, 200),
+    'BMI': (10, 80),
+    'heartRate': (20, 250),
+    'glucose': (20, 700)
+}
+
+# Função para calcular o escore de risco sem modelo preditivo
+def calcular_risco_simplificado(dados):
+    """
+    Calcula um escore de risco simples baseado em valores de referência
+    """
+    referencias = obter_contexto().estatisticas['referencias']
+    pontos = 0
+    
+    # Atribuir pontos para cada fator de risco
+    for fator, ref in referencias.items():
+        if fator in dados:
+            valor = dados[fator]
+            if valor >= ref['alto']:
+                pontos += 2
+            elif valor >= ref['moderado']:
+                pontos += 1
+                
+    # Fatores binários
+    fatores_binarios = ['currentSmoker', 'prevalentHyp', 'prevalentStroke', 'diabetes']
+    for fator in fatores_binarios:
+        if fator in dados and dados[fator] == 1:
+            pontos += 2
+            
+    # Calcular probabilidade normalizada (0 a 1)
+    # Considerando pontuação máxima possível = 16 (8 fatores contínuos + 4 binários)
+    max_pontos = 16
+    probabilidade = pontos / max_pontos
+    
+    return probabilidade
+
+# Função para categorizar o risco
+def categorizar_risco(probabilidade):
+    """
+    Categoriza o risco cardíaco com base na probabilidade
+    """
+    if probabilidade < 0.25:
+        return "Baixo", "green"
+    elif probabilidade < 0.50:
+        return "Moderado", "orange"
+    else:
+        return "Alto", "red"
+
+# Função para calcular o escore e a categoria de risco de vários pacientes
+def calcular_risco_lote(df):
+    """
+    Calcula o índice e a categoria de risco de todas as linhas de um DataFrame
+    com operações vetorizadas. Produz os mesmos valores de calcular_risco_simplificado
+    e categorizar_risco aplicados linha a linha.
+    """
+    referencias = obter_contexto().estatisticas['referencias']
+    pontos = np.zeros(len(df))
+    
+    # Atribuir pontos para cada fator de risco (NaN não pontua, como no cálculo escalar)
+    for fator, ref in referencias.items():
+        if fator in df.columns:
+            valores = df[fator].to_numpy(dtype=float)
+            pontos += np.where(valores >= ref['alto'], 2, np.where(valores >= ref['moderado'], 1, 0))
+            
+    # Fatores binários
+    fatores_binarios = ['currentSmoker', 'prevalentHyp', 'prevalentStroke', 'diabetes']
+    for fator in fatores_binarios:
+        if fator in df.columns:
+            pontos += np.where(df[fator].to_numpy(dtype=float) == 1, 2, 0)
+            
+    # Mesma normalização de calcular_risco_simplificado
+    max_pontos = 16
+    probabilidade = pontos / max_pontos
+    
+    # Categorizar com os mesmos limites de categorizar_risco
+    categoria = np.select([probabilidade < 0.25, probabilidade < 0.50], ["Baixo", "Moderado"], default="Alto")
+    
+    return pd.DataFrame({'probabilidade_risco': probabilidade, 'categoria_risco': categoria}, index=df.index)
+
+# Função para validar os dados de vários pacientes antes da geração dos relatórios
+def validar_pacientes(df):
+    """
+    Valida as colunas de pacientes de um DataFrame com operações vetorizadas
+    (colunas obrigatórias, valores numéricos presentes, indicadores 0/1 e faixas
+    plausíveis). Devolve as colunas convertidas para número e, para cada linha,
+    os motivos da rejeição separados por '; ' (texto vazio para linhas válidas).
+    """
+    motivos = np.full(len(df), '', dtype=object)
+    valores = pd.DataFrame(index=df.index)
+    
+    for coluna in COLUNAS_PACIENTE:
+        if coluna not in df.columns:
+            motivos = motivos + f'coluna ausente: {coluna}; '
+            continue
+            
+        original = df[coluna]
+        numerico = pd.to_numeric(original, errors='coerce')
+        valores[coluna] = numerico
+        numeros = numerico.to_numpy(dtype=float)
+        
+        ausente = original.isna().to_numpy()
+        invalido = ~ausente & np.isnan(numeros)
+        if coluna in COLUNAS_BINARIAS:
+            fora = ~np.isnan(numeros) & (numeros != 0) & (numeros != 1)
+            mensagem_fora = f'{coluna} deve ser 0 ou 1'
+        else:
+            minimo, maximo = FAIXAS_VALIDAS[coluna]
+            fora = ~np.isnan(numeros) & ((numeros < minimo) | (numeros > maximo))
+            mensagem_fora = f'{coluna} fora da faixa {minimo}-{maximo}'
+            
+        for mascara, mensagem in ((ausente, f'{coluna} ausente'),
+                                  (invalido, f'{coluna} não numérico'),
+                                  (fora, mensagem_fora)):
+            if mascara.any():
+                motivos = np.where(mascara, motivos + f'{mensagem}; ', motivos)
+                
+    motivos = pd.Series(motivos, index=df.index, dtype=object).str.rstrip('; ')
+    return valores, motivos
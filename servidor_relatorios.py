@@ -0,0 +1,334 @@
+import argparse
+import collections
+import ipaddress
+import json
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+from gerar_relatorio_simplificado import _inicializar_worker, verificar_arquivos_necessarios
+from risco_cardiaco import COLUNAS_PACIENTE, validar_pacientes
+
+# Tamanho máximo do corpo de uma requisição (JSON de um paciente)
+TAMANHO_MAXIMO_CORPO = 64 * 1024
+
+# Número de latências recentes usadas nas métricas
+JANELA_LATENCIAS = 1000
+
+# Segundos após a reconstrução do pool em que /saude continua indicando estado degradado
+JANELA_DEGRADADO_S = 60
+
+class ErroRequisicao(Exception):
+    """
+    Erro nos dados de uma requisição, devolvido ao cliente com o código HTTP informado
+    """
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+def validar_paciente(corpo):
+    """
+    Valida o JSON de uma requisição ({"nome": ..., "dados": {...}, "graficos": ..., "perfil": ...})
+    e devolve o nome, os dados numéricos do paciente e as opções do relatório
+    """
+    import pandas as pd
+    from gerador_relatorio_pdf_simplificado import BACKENDS_GRAFICOS, PERFIS_RELATORIO
+
+    try:
+        conteudo = json.loads(corpo)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ErroRequisicao(400, f'JSON inválido: {e}')
+    if not isinstance(conteudo, dict) or not isinstance(conteudo.get('dados'), dict):
+        raise ErroRequisicao(400, "O corpo deve ser um objeto com o campo 'dados'")
+
+    nome = conteudo.get('nome', 'Paciente')
+    if not isinstance(nome, str) or not nome.strip():
+        raise ErroRequisicao(400, "O campo 'nome' deve ser um texto não vazio")
+
+    ausentes = [coluna for coluna in COLUNAS_PACIENTE if coluna not in conteudo['dados']]
+    if ausentes:
+        raise ErroRequisicao(400, f"Campos ausentes em 'dados': {', '.join(ausentes)}")
+    dados = {}
+    for coluna in COLUNAS_PACIENTE:
+        valor = conteudo['dados'][coluna]
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+            raise ErroRequisicao(400, f"Valor inválido para '{coluna}': {valor!r}")
+        dados[coluna] = float(valor)
+    # Mesmas regras (indicadores 0/1 e faixas plausíveis) da validação dos lotes
+    motivo = validar_pacientes(pd.DataFrame([dados]))[1].iloc[0]
+    if motivo:
+        raise ErroRequisicao(400, f'Dados inválidos: {motivo}')
+
+    graficos = conteudo.get('graficos', 'vetorial')
+    if graficos not in BACKENDS_GRAFICOS:
+        raise ErroRequisicao(400, f"Tipo de gráficos inválido: {graficos!r} (opções: {', '.join(BACKENDS_GRAFICOS)})")
+    perfil = conteudo.get('perfil', 'completo')
+    if not isinstance(perfil, str) or perfil not in PERFIS_RELATORIO:
+        raise ErroRequisicao(400, f"Perfil de relatório inválido: {perfil!r} (opções: {', '.join(PERFIS_RELATORIO)})")
+    return nome, dados, {'graficos': graficos, 'perfil': perfil}
+
+def ler_tamanho_corpo(cabecalho):
+    """
+    Converte o cabeçalho Content-Length, recusando valores inválidos, negativos ou grandes demais
+    """
+    try:
+        tamanho = int(cabecalho)
+    except ValueError:
+        raise ErroRequisicao(400, f'Content-Length inválido: {cabecalho!r}')
+    if tamanho < 0:
+        raise ErroRequisicao(400, f'Content-Length inválido: {cabecalho!r}')
+    if tamanho > TAMANHO_MAXIMO_CORPO:
+        raise ErroRequisicao(413, f'Corpo maior que {TAMANHO_MAXIMO_CORPO} bytes')
+    return tamanho
+
+def _inicializar_worker_servico():
+    """
+    Inicializa um processo do pool do serviço; o Ctrl+C é tratado apenas pelo processo principal
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _inicializar_worker()
+
+def _gerar_pdf_tarefa(nome, dados, opcoes):
+    """
+    Gera o PDF de um paciente dentro de um processo do pool e devolve os bytes do arquivo
+    """
+    from gerador_relatorio_pdf_simplificado import RelatorioRiscoCardiaco, gerar_nome_arquivo
+
+    relatorio = RelatorioRiscoCardiaco(nome, dados, **opcoes)
+    pdf = relatorio.gerar_pdf()
+    return pdf, gerar_nome_arquivo(nome), relatorio.probabilidade_risco, relatorio.categoria_risco
+
+class ServicoRelatorios:
+    """
+    Pool de processos já aquecidos (população, estatísticas e matplotlib carregados)
+    e métricas do serviço. No máximo workers + fila relatórios ficam pendentes;
+    as requisições além desse limite são recusadas em vez de enfileiradas.
+    Se um processo do pool morrer, o pool é recriado e aquecido de novo.
+    """
+    def __init__(self, workers=1, fila=8):
+        self.workers = workers
+        self.executor = self._criar_pool()
+        self.trava_pool = threading.Lock()
+        self.pool_quebrado = False
+        self.reinicios_pool = 0
+        self.ultimo_reinicio = None
+        self.vagas = threading.BoundedSemaphore(workers + fila)
+        self.capacidade = workers + fila
+        self.inicio = time.time()
+        self.trava = threading.Lock()
+        self.contagens = collections.Counter()
+        self.em_andamento = 0
+        self.latencias = collections.deque(maxlen=JANELA_LATENCIAS)
+        self.impressao_digital = None
+
+    def aquecer(self):
+        """
+        Inicia todos os processos do pool antes da primeira requisição
+        """
+        from populacao import calcular_impressao_digital, ARQUIVO_POPULACAO
+
+        self.impressao_digital = calcular_impressao_digital(ARQUIVO_POPULACAO)
+        self._aquecer_pool(self.executor)
+
+    def _criar_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_inicializar_worker_servico)
+
+    def _aquecer_pool(self, executor):
+        for futuro in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            futuro.result()
+
+    def reiniciar_pool(self, quebrado):
+        """
+        Substitui o pool quebrado (um processo morreu) por um novo, já aquecido.
+        As requisições que encontraram o mesmo pool quebrado o reiniciam uma única vez.
+        """
+        with self.trava_pool:
+            if self.executor is not quebrado:
+                return
+            with self.trava:
+                self.pool_quebrado = True
+            quebrado.shutdown(wait=False, cancel_futures=True)
+            executor = self._criar_pool()
+            self._aquecer_pool(executor)
+            self.executor = executor
+            with self.trava:
+                self.pool_quebrado = False
+                self.reinicios_pool += 1
+                self.ultimo_reinicio = time.time()
+
+    def gerar(self, nome, dados, opcoes):
+        """
+        Gera o relatório no pool e devolve (pdf, nome_arquivo, probabilidade, categoria)
+        """
+        if not self.vagas.acquire(blocking=False):
+            self.registrar('recusadas')
+            raise ErroRequisicao(503, 'Serviço ocupado: tente novamente em instantes')
+        inicio = time.perf_counter()
+        with self.trava:
+            self.em_andamento += 1
+        executor = self.executor
+        try:
+            resultado = executor.submit(_gerar_pdf_tarefa, nome, dados, opcoes).result()
+        except BrokenProcessPool:
+            self.registrar('erros')
+            try:
+                self.reiniciar_pool(executor)
+            except Exception as e:
+                raise ErroRequisicao(503, f'Pool de processos indisponível: {e}')
+            raise ErroRequisicao(503, 'Um processo do serviço foi encerrado durante o relatório: tente novamente')
+        except Exception as e:
+            self.registrar('erros')
+            raise ErroRequisicao(500, f'Erro ao gerar relatório: {e}')
+        finally:
+            with self.trava:
+                self.em_andamento -= 1
+            self.vagas.release()
+        self.registrar('relatorios', time.perf_counter() - inicio)
+        return resultado
+
+    def registrar(self, evento, latencia=None):
+        with self.trava:
+            self.contagens[evento] += 1
+            if latencia is not None:
+                self.latencias.append(latencia)
+
+    def metricas(self):
+        """
+        Estado do serviço: contagens, relatórios em andamento e latências recentes.
+        O status é 'degradado' enquanto o pool está quebrado e logo após ser recriado.
+        """
+        with self.trava:
+            latencias = sorted(self.latencias)
+            degradado = self.pool_quebrado or (self.ultimo_reinicio is not None and
+                                               time.time() - self.ultimo_reinicio < JANELA_DEGRADADO_S)
+            metricas = {
+                'status': 'degradado' if degradado else 'ok',
+                'tempo_ativo_s': round(time.time() - self.inicio, 1),
+                'workers': self.workers,
+                'capacidade': self.capacidade,
+                'em_andamento': self.em_andamento,
+                'relatorios': self.contagens['relatorios'],
+                'erros': self.contagens['erros'],
+                'invalidas': self.contagens['invalidas'],
+                'recusadas': self.contagens['recusadas'],
+                'reinicios_pool': self.reinicios_pool
+            }
+        for rotulo, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            metricas[rotulo] = round(latencias[min(int(q * len(latencias)), len(latencias) - 1)] * 1000, 1) \
+                if latencias else None
+        metricas['populacao_sha256'] = self.impressao_digital
+        return metricas
+
+    def encerrar(self):
+        self.executor.shutdown()
+
+class ManipuladorRelatorios(BaseHTTPRequestHandler):
+    """
+    POST /relatorio: JSON do paciente -> PDF. GET /saude: métricas em JSON.
+    """
+    server_version = 'ServidorRelatorios/1.0'
+
+    def do_GET(self):
+        if self.path != '/saude':
+            self.enviar_json(404, {'erro': f'Caminho não encontrado: {self.path}'})
+            return
+        self.enviar_json(200, self.server.servico.metricas())
+
+    def do_POST(self):
+        servico = self.server.servico
+        if self.path != '/relatorio':
+            self.enviar_json(404, {'erro': f'Caminho não encontrado: {self.path}'})
+            return
+        corpo_lido = False
+        try:
+            try:
+                tamanho = ler_tamanho_corpo(self.headers.get('Content-Length', '0'))
+                corpo = self.rfile.read(tamanho)
+                corpo_lido = True
+                nome, dados, opcoes = validar_paciente(corpo)
+            except ErroRequisicao:
+                servico.registrar('invalidas')
+                raise
+            pdf, nome_arquivo, probabilidade, categoria = servico.gerar(nome, dados, opcoes)
+        except ErroRequisicao as e:
+            self.enviar_json(e.status, {'erro': str(e)}, fechar=not corpo_lido)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.send_header('Content-Disposition', f"inline; filename*=UTF-8''{quote(nome_arquivo)}")
+        self.send_header('X-Probabilidade-Risco', f'{probabilidade:.4f}')
+        self.send_header('X-Categoria-Risco', quote(categoria))
+        self.end_headers()
+        self.wfile.write(pdf)
+
+    def enviar_json(self, status, conteudo, fechar=False):
+        corpo = json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        if fechar:
+            # O corpo da requisição não foi lido: a conexão não pode ser reaproveitada
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+def endereco_local(host):
+    """
+    Verifica se o endereço é de loopback (o serviço recebe dados de pacientes
+    sem autenticação e não deve ficar acessível pela rede)
+    """
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description='Serviço HTTP local de geração de relatórios de risco cardiovascular')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                      help='Endereço de loopback em que o serviço escuta (padrão: 127.0.0.1)')
+    parser.add_argument('-p', '--porta', type=int, default=8000,
+                      help='Porta do serviço (padrão: 8000)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                      help='Número de processos que geram relatórios em paralelo')
+    parser.add_argument('--fila', type=int, default=8,
+                      help='Requisições que podem aguardar um processo livre; as demais recebem 503 (padrão: 8)')
+    args = parser.parse_args()
+
+    if not endereco_local(args.host):
+        parser.error('--host deve ser um endereço de loopback (ex.: 127.0.0.1)')
+    if args.workers < 1:
+        parser.error('--workers deve ser maior ou igual a 1')
+    if args.fila < 0:
+        parser.error('--fila deve ser maior ou igual a 0')
+
+    if not verificar_arquivos_necessarios():
+        sys.exit(1)
+
+    servico = ServicoRelatorios(args.workers, args.fila)
+    print(f"Carregando dados em {args.workers} processo(s)...")
+    servico.aquecer()
+
+    servidor = ThreadingHTTPServer((args.host, args.porta), ManipuladorRelatorios)
+    servidor.servico = servico
+    print(f"Serviço disponível em http://{args.host}:{servidor.server_address[1]} "
+          f"(POST /relatorio, GET /saude)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando o serviço...")
+    finally:
+        servidor.server_close()
+        servico.encerrar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import http.client
+import json
+import os
+import signal
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+import pandas as pd
+from gerar_relatorio_simplificado import verificar_arquivos_necessarios
+from risco_cardiaco import COLUNAS_PACIENTE
+from servidor_relatorios import ManipuladorRelatorios, ServicoRelatorios, TAMANHO_MAXIMO_CORPO
+
+def iniciar_servico():
+    """
+    Inicia o serviço de relatórios com um processo numa porta livre de 127.0.0.1
+    """
+    servico = ServicoRelatorios(workers=1, fila=1)
+    servico.aquecer()
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ManipuladorRelatorios)
+    servidor.servico = servico
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, servico
+
+def requisitar(porta, metodo, caminho, corpo=b'', content_length=None):
+    """
+    Envia uma requisição e devolve (status, cabeçalhos, corpo). content_length permite
+    enviar um cabeçalho Content-Length arbitrário (inválido, negativo ou grande demais).
+    """
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+    try:
+        conexao.putrequest(metodo, caminho)
+        conexao.putheader('Content-Type', 'application/json')
+        conexao.putheader('Content-Length', str(len(corpo)) if content_length is None else content_length)
+        conexao.endheaders(corpo)
+        resposta = conexao.getresponse()
+        return resposta.status, dict(resposta.getheaders()), resposta.read()
+    finally:
+        conexao.close()
+
+def paciente_exemplo():
+    linha = pd.read_csv('pacientes.csv').iloc[0]
+    return {'nome': str(linha['nome_paciente']),
+            'dados': {coluna: float(linha[coluna]) for coluna in COLUNAS_PACIENTE}}
+
+def main():
+    """
+    Verifica as respostas do serviço HTTP local: PDF, erros de validação, limites do corpo,
+    /saude e a recuperação do pool quando um processo morre. Termina com código 1 se alguma falhar.
+    """
+    if not verificar_arquivos_necessarios():
+        sys.exit(1)
+
+    servidor, servico = iniciar_servico()
+    porta = servidor.server_address[1]
+    corpo_valido = json.dumps(paciente_exemplo()).encode('utf-8')
+    falhas = []
+
+    def verificar(descricao, condicao):
+        print(f"{'ok   ' if condicao else 'FALHA'} {descricao}")
+        if not condicao:
+            falhas.append(descricao)
+
+    def status_saude():
+        return json.loads(requisitar(porta, 'GET', '/saude')[2])['status']
+
+    try:
+        verificar('GET /saude responde ok', status_saude() == 'ok')
+        status, cabecalhos, pdf = requisitar(porta, 'POST', '/relatorio', corpo_valido)
+        verificar('POST /relatorio devolve o PDF',
+                  status == 200 and cabecalhos.get('Content-Type') == 'application/pdf' and pdf.startswith(b'%PDF'))
+        verificar('JSON inválido recebe 400', requisitar(porta, 'POST', '/relatorio', b'{')[0] == 400)
+        verificar('Content-Length não numérico recebe 400',
+                  requisitar(porta, 'POST', '/relatorio', corpo_valido, content_length='abc')[0] == 400)
+        verificar('Content-Length negativo recebe 400',
+                  requisitar(porta, 'POST', '/relatorio', corpo_valido, content_length='-1')[0] == 400)
+        verificar('Corpo grande demais recebe 413',
+                  requisitar(porta, 'POST', '/relatorio', content_length=str(TAMANHO_MAXIMO_CORPO + 1))[0] == 413)
+        verificar('Caminho desconhecido recebe 404', requisitar(porta, 'GET', '/outro')[0] == 404)
+
+        # Encerrar o único processo do pool: a próxima requisição recebe 503 e o pool é recriado
+        os.kill(servico.executor.submit(os.getpid).result(), signal.SIGKILL)
+        verificar('Requisição com o processo encerrado recebe 503',
+                  requisitar(porta, 'POST', '/relatorio', corpo_valido)[0] == 503)
+        verificar('GET /saude indica estado degradado após recriar o pool', status_saude() == 'degradado')
+        verificar('POST /relatorio volta a funcionar com o novo pool',
+                  requisitar(porta, 'POST', '/relatorio', corpo_valido)[0] == 200)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        servico.encerrar()
+
+    if falhas:
+        print(f"\n{len(falhas)} verificação(ões) falharam")
+        sys.exit(1)
+    print("\nTodas as verificações passaram")
+
+if __name__ == "__main__":
+    main()